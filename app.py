@@ -1,31 +1,81 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 import threading
+import functools
+import hashlib
 import os
-import asyncio
+import re
 import json
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from utils import (
     start_watcher, stop_watcher, restart_watcher, is_running,
     get_processed_files, clear_processed_files, get_config, save_config,
     update_config, get_status, log_message, load_config, setup_logger,
-    add_processed_file, process_directory_with_logging
+    add_processed_file, process_directory_with_logging, get_video_extensions,
+    flush_logs, get_recent_logs, clear_recent_logs
 )
 from version import get_version_info
+import orjson
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """使用 orjson 的 JSON 提供器，jsonify 和 request.get_json 均经由 orjson 处理"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # 直接输出 orjson 生成的字节，省去解码再编码
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS),
+            mimetype=self.mimetype
+        )
+
 
 app = Flask(__name__, static_folder='web/static', template_folder='web/static')
+app.json = ORJSONProvider(app)
 
 # 处理日志
 # 统一使用watcher.py的log_message函数记录日志
 
-# 存储webhook消息的列表，最多保存100条
-webhook_messages = []
+# 存储webhook消息的队列，最多保存100条（超出时自动丢弃最旧的消息）
+webhook_messages = deque(maxlen=100)
 
 # process_directory_with_logging 函数已移至 utils/video_processor.py
 
 
+# 首页内容缓存 (st_mtime_ns, 内容, ETag)，文件修改时间变化后重新读取
+_index_page = None
+
+
+def _get_index_page():
+    """读取并缓存 index.html 内容及其 ETag，文件更新后（mtime 变化）自动刷新缓存"""
+    global _index_page
+    index_path = os.path.join(app.static_folder, 'index.html')
+    mtime_ns = os.stat(index_path).st_mtime_ns
+    cached = _index_page
+    if cached is None or cached[0] != mtime_ns:
+        with open(index_path, 'rb') as f:
+            content = f.read()
+        cached = (mtime_ns, content, hashlib.blake2b(content, digest_size=8).hexdigest())
+        _index_page = cached
+    return cached[1], cached[2]
+
+
 @app.route('/')
 def index():
-    return send_from_directory(app.static_folder, 'index.html')
+    content, etag = _get_index_page()
+    response = Response(content, mimetype='text/html')
+    response.set_etag(etag)
+    # ETag 匹配时返回 304，不再传输页面内容
+    return response.make_conditional(request)
 
 
 @app.route('/webhook')
@@ -94,71 +144,22 @@ def clear_processed():
 
 @app.route('/api/logs')
 def get_logs():
-    logs = []
-
-    # 统一从watcher.log文件读取所有日志
-    log_file_path = os.path.join('logs', 'watcher.log')
-    if os.path.exists(log_file_path):
-        try:
-            with open(log_file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                # 显示所有日志行，与后端日志文件保持一致
-                recent_lines = lines
-
-                for line in recent_lines:
-                    line = line.strip()
-                    if line:
-                        # 解析日志格式: 2025-06-24 23:13:57,077 - subtitle_watcher - INFO - 消息
-                        parts = line.split(' - ', 3)
-                        if len(parts) >= 4:
-                            timestamp = parts[0]
-                        # 移除时间戳中的毫秒部分
-                        if ',' in timestamp:
-                            timestamp = timestamp.split(',')[0]
-                            level = parts[2]
-                            message = parts[3]
-                            logs.append({
-                                'timestamp': timestamp,
-                                'message': f"[{level}] {message}",
-                                'level': level
-                            })
-                        else:
-                            # 如果格式不匹配，直接显示原始行
-                            # 使用北京时间
-                            from utils.watcher import get_beijing_formatter
-                            import pytz
-                            beijing_tz = pytz.timezone('Asia/Shanghai')
-                            beijing_time = datetime.now(
-                                beijing_tz).strftime('%Y-%m-%d %H:%M:%S')
-                            logs.append({
-                                'timestamp': beijing_time,
-                                'message': line,
-                                'level': 'INFO'
-                            })
-        except Exception as e:
-            # 如果读取日志文件失败，添加错误信息
-            # 使用北京时间
-            import pytz
-            beijing_tz = pytz.timezone('Asia/Shanghai')
-            beijing_time = datetime.now(
-                beijing_tz).strftime('%Y-%m-%d %H:%M:%S')
-            logs.append({
-                'timestamp': beijing_time,
-                'message': f"读取日志文件失败: {str(e)}",
-                'level': 'ERROR'
-            })
-
-    return jsonify({"logs": logs})
+    # 直接返回内存中的最近日志，无需读取和解析日志文件
+    return jsonify({"logs": get_recent_logs()})
 
 
 @app.route('/api/clear-logs', methods=['POST'])
 def clear_logs():
     try:
-        # 清空日志文件
+        # 清空日志文件：先写出缓冲中的日志，避免清空后旧日志被重新追加
         log_file = './logs/watcher.log'
-        if os.path.exists(log_file):
-            with open(log_file, 'w', encoding='utf-8') as f:
-                f.write('')  # 清空文件内容
+        flush_logs()
+        try:
+            # 日志处理器以追加模式打开文件，截断后新日志会从文件开头继续写入
+            os.truncate(log_file, 0)
+        except FileNotFoundError:
+            pass
+        clear_recent_logs()
 
         # 清空已处理文件记录
         cleared_count = clear_processed_files()
@@ -169,9 +170,72 @@ def clear_logs():
         return jsonify({"message": f"清空日志失败: {str(e)}", "success": False})
 
 
+# 手动处理任务：单线程执行器保证任务按提交顺序执行，请求立即返回任务ID
+_process_executor = ThreadPoolExecutor(max_workers=1)
+_process_jobs = {}
+_process_jobs_lock = threading.Lock()
+# 最多保留的已结束任务记录数
+_MAX_FINISHED_JOBS = 20
+
+
+def _update_job(job_id, **fields):
+    """更新手动处理任务的状态"""
+    with _process_jobs_lock:
+        _process_jobs[job_id].update(fields)
+
+
+def _run_process_job(job_id, watch_dirs):
+    """在后台线程中处理所有监控目录下的视频文件"""
+    try:
+        _update_job(job_id, status='running')
+        log_message('info', f"🚀 开始处理所有监控目录下的视频文件: {watch_dirs}")
+
+        # 扩展名只需计算一次，所有目录共用
+        exts_tuple = get_video_extensions()
+
+        existing_dirs = []
+        for directory in watch_dirs:
+            if os.path.exists(directory):
+                existing_dirs.append(directory)
+            else:
+                log_message('warning', f"⚠️ 目录不存在，跳过: {directory}")
+
+        # 各目录的进度 {目录: (已完成数, 总数)}，汇总后写入任务状态
+        dir_progress = {}
+
+        def process_dir(directory):
+            def progress_cb(done, total):
+                with _process_jobs_lock:
+                    dir_progress[directory] = (done, total)
+                    _process_jobs[job_id].update(
+                        processed=sum(d for d, _ in dir_progress.values()),
+                        total=sum(t for _, t in dir_progress.values()))
+
+            log_message('info', f"📁 处理目录中的视频文件: {directory}")
+            # 使用从 utils/video_processor.py 导入的函数
+            return process_directory_with_logging(directory, exts_tuple, progress_cb=progress_cb)
+
+        # 多个监控目录并行扫描，文件统一由共享的并发处理器线程池下载弹幕
+        if len(existing_dirs) > 1:
+            with ThreadPoolExecutor(max_workers=len(existing_dirs)) as executor:
+                counts = list(executor.map(process_dir, existing_dirs))
+        else:
+            counts = [process_dir(directory) for directory in existing_dirs]
+
+        total_count = sum(counts)
+        processed_dirs = [f"{directory}({count}个文件)"
+                          for directory, count in zip(existing_dirs, counts)]
+
+        _update_job(job_id, status='completed', count=total_count, processed_dirs=processed_dirs,
+                    message=f"处理完成，共处理 {total_count} 个视频文件\n处理的目录: {', '.join(processed_dirs)}")
+    except Exception as e:
+        log_message('error', f"❌ 手动处理失败: {str(e)}")
+        _update_job(job_id, status='failed', message=f"处理失败: {str(e)}")
+
+
 @app.route('/api/process-now', methods=['POST'])
 def process_now():
-    """立即处理所有监控目录下的视频文件，下载对应弹幕"""
+    """立即处理所有监控目录下的视频文件，下载对应弹幕（后台执行，返回任务ID）"""
     try:
         # 获取当前配置的监控目录
         config = get_config()
@@ -179,33 +243,48 @@ def process_now():
         if not watch_dirs:
             watch_dirs = ['./videos']  # 默认目录
 
-        log_message('info', f"🚀 开始处理所有监控目录下的视频文件: {watch_dirs}")
-
-        total_count = 0
-        processed_dirs = []
-
-        # 处理每个监控目录
-        for directory in watch_dirs:
-            if os.path.exists(directory):
-                log_message('info', f"📁 处理目录中的视频文件: {directory}")
-                # 使用从 utils/video_processor.py 导入的函数
-                count = process_directory_with_logging(directory)
-                total_count += count
-                processed_dirs.append(f"{directory}({count}个文件)")
-            else:
-                log_message('warning', f"⚠️ 目录不存在，跳过: {directory}")
+        job_id = uuid.uuid4().hex
+        with _process_jobs_lock:
+            # 清理最早结束的任务记录，避免无限增长
+            finished = [jid for jid, job in _process_jobs.items()
+                        if job['status'] in ('completed', 'failed')]
+            for jid in finished[:max(0, len(finished) - _MAX_FINISHED_JOBS + 1)]:
+                del _process_jobs[jid]
+            _process_jobs[job_id] = {
+                'status': 'pending',
+                'processed': 0,
+                'total': 0,
+                'count': 0,
+                'processed_dirs': [],
+                'message': '处理任务已提交'
+            }
+        _process_executor.submit(_run_process_job, job_id, watch_dirs)
 
         return jsonify({
-            "message": f"处理完成，共处理 {total_count} 个视频文件\n处理的目录: {', '.join(processed_dirs)}",
+            "message": "处理任务已提交",
             "success": True,
-            "count": total_count,
-            "processed_dirs": processed_dirs
+            "job_id": job_id
         })
     except Exception as e:
         log_message('error', f"❌ 手动处理失败: {str(e)}")
         return jsonify({"message": f"处理失败: {str(e)}", "success": False})
 
 
+@app.route('/api/process-now/<job_id>')
+def process_now_status(job_id):
+    """查询手动处理任务的进度"""
+    with _process_jobs_lock:
+        job = _process_jobs.get(job_id)
+        job = dict(job) if job else None
+    if job is None:
+        return jsonify({"message": "任务不存在", "success": False}), 404
+    return jsonify({
+        "success": job['status'] != 'failed',
+        "job_id": job_id,
+        **job
+    })
+
+
 @app.route('/api/reload-config', methods=['POST'])
 def reload_config():
     """重新加载配置文件"""
@@ -218,6 +297,14 @@ def reload_config():
         return jsonify({"message": f"配置重新加载失败: {str(e)}", "success": False})
 
 
+# 允许通过 /api/config 更新的配置项
+_VALID_CONFIG_KEYS = frozenset({
+    'watch_dirs', 'file_extensions', 'wait_time', 'max_retries', 'retry_delay', 'max_concurrent_workers', 'enable_logging',
+    'log_level', 'max_log_lines', 'keep_log_lines', 'cron_enabled', 'cron_schedule', 'danmu_api',
+    'use_polling', 'poll_interval', 'dir_scan_cache', 'danmu_freshness_sec'
+})
+
+
 @app.route('/api/config', methods=['GET', 'POST'])
 def config():
     if request.method == 'POST':
@@ -227,10 +314,7 @@ def config():
                 return jsonify({"message": "无效的配置数据", "success": False})
 
             # 验证配置数据
-            valid_keys = ['watch_dirs', 'file_extensions', 'wait_time', 'max_retries', 'retry_delay', 'max_concurrent_workers', 'enable_logging',
-                          'log_level', 'max_log_lines', 'keep_log_lines', 'cron_enabled', 'cron_schedule', 'danmu_api']
-            filtered_config = {k: v for k,
-                               v in data.items() if k in valid_keys}
+            filtered_config = {k: data[k] for k in data.keys() & _VALID_CONFIG_KEYS}
 
             if not filtered_config:
                 return jsonify({"message": "没有有效的配置项", "success": False})
@@ -348,11 +432,8 @@ def receive_webhook():
             "remote_addr": request.remote_addr
         }
 
-        # 添加到消息列表，保持最多100条
-        global webhook_messages
-        webhook_messages.insert(0, webhook_msg)  # 新消息插入到列表开头
-        if len(webhook_messages) > 100:
-            webhook_messages = webhook_messages[:100]
+        # 新消息插入到队列开头，保持最多100条
+        webhook_messages.appendleft(webhook_msg)
 
         log_message('info', f"收到webhook消息: {request.remote_addr}")
 
@@ -373,16 +454,15 @@ def get_webhook_messages():
     """获取所有webhook消息"""
     return jsonify({
         "success": True,
-        "messages": webhook_messages
+        "messages": list(webhook_messages)
     })
 
 
 @app.route('/api/webhook/clear', methods=['POST'])
 def clear_webhook_messages():
     """清空所有webhook消息"""
-    global webhook_messages
     count = len(webhook_messages)
-    webhook_messages = []
+    webhook_messages.clear()
 
     log_message('info', f"清空了{count}条webhook消息")
 
@@ -396,20 +476,9 @@ def clear_webhook_messages():
 def clear_cache():
     """清除弹幕缓存"""
     try:
-        # 尝试获取全局下载器实例
+        # 使用处理文件时共用的全局下载器实例
         from utils.watcher import get_global_downloader
-        downloader = get_global_downloader()
-
-        # 如果全局实例不存在，创建新的实例
-        if downloader is None:
-            config = get_config()
-            from danmu.danmu_downloader import DanmuDownloader
-            downloader = DanmuDownloader(config)
-            log_message('debug', "使用新创建的下载器实例清除缓存")
-        else:
-            log_message('debug', "使用全局下载器实例清除缓存")
-
-        downloader.clear_cache()
+        get_global_downloader().clear_cache()
 
         log_message('info', "弹幕缓存已清除")
         return jsonify({
@@ -429,20 +498,9 @@ def clear_cache():
 def get_cache_stats():
     """获取缓存统计信息"""
     try:
-        # 尝试获取全局下载器实例
+        # 使用处理文件时共用的全局下载器实例
         from utils.watcher import get_global_downloader
-        downloader = get_global_downloader()
-
-        # 如果全局实例不存在，创建新的实例
-        if downloader is None:
-            config = get_config()
-            from danmu.danmu_downloader import DanmuDownloader
-            downloader = DanmuDownloader(config)
-            log_message('debug', "使用新创建的下载器实例获取缓存统计")
-        else:
-            log_message('debug', "使用全局下载器实例获取缓存统计")
-
-        cache_stats = downloader.get_cache_stats()
+        cache_stats = get_global_downloader().get_cache_stats()
 
         return jsonify({
             "success": True,
@@ -500,31 +558,33 @@ def count_ass_files():
         })
 
 
+@functools.lru_cache(maxsize=32)
+def _ensure_dir(path):
+    """确保目录存在，同一路径只创建一次"""
+    os.makedirs(path, exist_ok=True)
+    return True
+
+
+# 测试视频文件名匹配规则（整名匹配，同时完成筛选和集数提取）
+_TEST_EPISODE_RE = re.compile(r'凡人修仙传 - S01E(\d+) - 第 \d+ 集\.mp4$')
+
+
 @app.route('/api/create-test', methods=['POST'])
 def create_test():
     test_dir = "./test_videos"
-    os.makedirs(test_dir, exist_ok=True)
+    _ensure_dir(test_dir)
 
-    # 获取当前测试视频集数
-    import glob
-    import re
-
-    # 查找现有的测试视频文件
-    existing_files = glob.glob(os.path.join(
-        test_dir, "凡人修仙传 - S01E* - 第 * 集.mp4"))
+    # 获取当前测试视频集数：单次 scandir 列出目录，每个文件名只做一次正则匹配
+    try:
+        with os.scandir(test_dir) as it:
+            episodes = [int(m.group(1)) for m in (_TEST_EPISODE_RE.match(entry.name) for entry in it)
+                        if m]
+    except FileNotFoundError:
+        # 目录在运行期间被删除，create_test_video 会重新创建
+        episodes = []
 
     # 确定下一集的集数
-    next_episode = 1
-    if existing_files:
-        # 从文件名中提取集数
-        episode_numbers = []
-        for file in existing_files:
-            match = re.search(r'S01E(\d+)', file)
-            if match:
-                episode_numbers.append(int(match.group(1)))
-
-        if episode_numbers:
-            next_episode = max(episode_numbers) + 1
+    next_episode = max(episodes, default=0) + 1
 
     # 生成下一个集数的测试文件名
     test_file = os.path.join(
@@ -560,27 +620,23 @@ if __name__ == '__main__':
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
 
-        # 文件处理器
-        import os
-        os.makedirs('logs', exist_ok=True)
-        file_handler = logging.FileHandler(
-            'logs/watcher.log', encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
-
         # 格式化器
         # 使用北京时间格式化器
-        from utils.watcher import get_beijing_formatter
-        formatter = get_beijing_formatter()
-        console_handler.setFormatter(formatter)
-        file_handler.setFormatter(formatter)
+        from utils.watcher import (
+            get_beijing_formatter, get_log_queue_handler, get_log_ring_handler)
+        console_handler.setFormatter(get_beijing_formatter())
 
         danmu_logger.addHandler(console_handler)
         if config.get('enable_logging', True):
-            danmu_logger.addHandler(file_handler)
+            # 与watcher共用日志文件的队列处理器，由后台线程写入文件
+            danmu_logger.addHandler(get_log_queue_handler())
+            # 同时写入内存日志缓冲，供 /api/logs 展示
+            danmu_logger.addHandler(get_log_ring_handler())
 
     # 启动时自动开始监听
     log_message('info', "程序启动，自动开启文件监听功能")
     start_watcher()
 
-    # 禁用重新加载器以避免多进程问题
-    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
+    # 使用 waitress 多线程 WSGI 服务器（单进程，监听器与请求线程共享状态）
+    from waitress import serve
+    serve(app, host='0.0.0.0', port=5000, threads=8)
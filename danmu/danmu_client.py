@@ -5,12 +5,27 @@
 用于请求弹幕JSON数据的工具类
 """
 
-import json
+import functools
 import logging
+import os
+import orjson
 import requests
+import sys
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
-from urllib.parse import urljoin
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+@functools.lru_cache(maxsize=8)
+def _load_danmu_config(config_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """读取并解析配置文件中的danmu_api部分，按 (路径, 修改时间) 缓存，文件未修改时不重复读取"""
+    with open(config_path, 'rb') as f:
+        return orjson.loads(f.read()).get('danmu_api', {})
 
 
 class DanmuClient:
@@ -20,6 +35,8 @@ class DanmuClient:
     - 作品列表缓存（默认5分钟有效期）
     - 弹幕源缓存（默认10分钟有效期）
     - 分集列表缓存（默认10分钟有效期）
+
+    弹幕源和分集缓存按LRU淘汰，最多保留 CACHE_MAX_ENTRIES 条，避免长时间运行时无限增长
     """
 
     # 新版API接口路径
@@ -32,6 +49,16 @@ class DanmuClient:
     LIBRARY_CACHE_TTL = 300  # 作品列表缓存5分钟
     SOURCES_CACHE_TTL = 600  # 弹幕源缓存10分钟
     EPISODES_CACHE_TTL = 600  # 分集列表缓存10分钟
+    CACHE_MAX_ENTRIES = 256  # 弹幕源/分集缓存的最大条目数（LRU淘汰）
+
+    # 连接池与重试配置
+    REQUEST_TIMEOUT = 30  # 单次请求超时时间（秒）
+    POOL_SIZE = 32  # 每个主机保持的最大连接数，覆盖并发处理线程和分集并发请求
+    MAX_RETRIES = 3  # 连接失败或网关类错误时的自动重试次数
+    RETRY_BACKOFF = 0.3  # 重试退避系数（0.3s, 0.6s, 1.2s）
+    RETRY_STATUS = (429, 502, 503, 504)
+    MAX_SOURCE_WORKERS = 8  # 并发获取多个弹幕源分集列表的最大线程数
+    MAX_DANMAKU_WORKERS = 8  # 批量获取分集弹幕的最大并发数，避免对服务器造成过大压力
 
     def __init__(self, config_path: str = "config/config.json", base_url: str = None):
         """初始化弹幕客户端
@@ -44,7 +71,20 @@ class DanmuClient:
         self.config = self._load_config(config_path)
         if base_url:
             self.config['base_url'] = base_url
+        self._rebuild_urls()
         self.session = requests.Session()
+        # 复用连接避免重复TCP/TLS握手，瞬时错误由传输层自动重试
+        adapter = HTTPAdapter(
+            pool_connections=self.POOL_SIZE,
+            pool_maxsize=self.POOL_SIZE,
+            max_retries=Retry(
+                total=self.MAX_RETRIES,
+                backoff_factor=self.RETRY_BACKOFF,
+                status_forcelist=self.RETRY_STATUS
+            )
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.session.headers.update({
             'User-Agent': 'DanmuClient/1.0',
             'Accept': 'application/json',
@@ -52,12 +92,19 @@ class DanmuClient:
         })
 
         # 设置API Key认证
-        self.api_key = self.config.get('token', '')
+        self._set_api_key(self.config.get('token', ''))
 
         # 初始化缓存
         self._library_cache = {'data': None, 'timestamp': 0}
-        self._sources_cache = {}  # {anime_id: {'data': sources, 'timestamp': timestamp}}
-        self._episodes_cache = {}  # {source_id: {'data': episodes, 'timestamp': timestamp}}
+        self._sources_cache = OrderedDict()  # {anime_id: {'data': sources, 'timestamp': timestamp}}
+        self._episodes_cache = OrderedDict()  # {source_id: {'data': episodes, 'timestamp': timestamp}}
+        self._cache_lock = threading.Lock()
+        # 作品标题索引 (作品列表, 预先转小写的 [(标题, 季数, 作品)], {(标题, 季数): 作品})
+        self._title_index = (None, [], {})
+
+        # 进行中的请求 {(url, params): Future}，相同请求并发到达时只发送一次
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
 
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """加载配置文件
@@ -69,13 +116,26 @@ class DanmuClient:
             配置字典
         """
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            return config.get('danmu_api', {})
+            config = _load_danmu_config(config_path, os.stat(config_path).st_mtime_ns)
+            # 返回副本，客户端修改base_url/token时不影响缓存
+            return dict(config)
         except Exception as e:
-            self.logger.error(f"加载配置文件失败: {e}")
+            self.logger.error("加载配置文件失败: %s", e)
             raise
 
+    def _rebuild_urls(self) -> None:
+        """根据当前base_url预先拼接各接口地址，避免每次请求重复读取配置和拼接字符串"""
+        # 统一去掉末尾的斜杠，避免拼接出 "//api" 形式的地址
+        base_url = (self.config.get('base_url') or '').rstrip('/')
+        # 弹幕接口优先使用danmu_api.base_url，然后是根级别的base_url
+        danmaku_base_url = (self.config.get('danmu_api', {}).get('base_url') or '').rstrip('/') or base_url
+        self._base_url = base_url
+        self._library_url = f"{base_url}{self.LIBRARY_ENDPOINT}"
+        self._sources_url_tmpl = f"{base_url}{self.ANIME_SOURCES_ENDPOINT}/{{}}/sources"
+        self._episodes_url_tmpl = f"{base_url}{self.SOURCE_EPISODES_ENDPOINT}/{{}}/episodes"
+        self._danmaku_url_tmpl = f"{danmaku_base_url}{self.DANMAKU_ENDPOINT}/{{}}"
+        self._danmaku_base_url = danmaku_base_url
+
     def set_base_url(self, base_url: str) -> None:
         """设置base_url
 
@@ -86,7 +146,12 @@ class DanmuClient:
         current_base_url = self.config.get('base_url', '')
         if current_base_url != base_url:
             self.config['base_url'] = base_url
-            self.logger.info(f"已更新base_url: {base_url}")
+            self._rebuild_urls()
+            # 缓存的数据来自旧服务器，切换后全部失效
+            self.invalidate_library()
+            self.invalidate_sources()
+            self.invalidate_episodes()
+            self.logger.info("已更新base_url: %s", base_url)
         else:
             # 如果base_url没有变化，只更新配置但不输出日志
             self.config['base_url'] = base_url
@@ -109,12 +174,24 @@ class DanmuClient:
         current_token = self.config.get('token', '')
         if current_token != token:
             self.config['token'] = token
-            self.api_key = token
-            self.logger.info(f"已更新API Key: {'已设置' if token else '已清除'}")
+            self._set_api_key(token)
+            self.logger.info("已更新API Key: %s", '已设置' if token else '已清除')
         else:
             # 如果token没有变化，只更新配置但不输出日志
             self.config['token'] = token
-            self.api_key = token
+            self._set_api_key(token)
+
+    def _redact(self, text: str) -> str:
+        """隐去文本中出现的API Key，避免写入日志"""
+        if self.api_key:
+            text = text.replace(quote(self.api_key, safe=''), '***').replace(self.api_key, '***')
+        return text
+
+    def _set_api_key(self, token: str) -> None:
+        """设置API Key，并预先生成每次请求都要附带的认证参数"""
+        self.api_key = token
+        self._auth_params = {'api_key': token} if token else {}
+        self._auth_params_key = tuple(self._auth_params.items())
 
     def get_token(self) -> str:
         """获取当前的token
@@ -124,6 +201,9 @@ class DanmuClient:
         """
         return self.config.get('token', '')
 
+    # 条件请求命中（服务器返回304）时 _request_json 返回的标记
+    NOT_MODIFIED = object()
+
     def _make_request(self, url: str, params: Optional[Dict] = None) -> Dict[str, Any]:
         """发送HTTP请求
 
@@ -134,21 +214,72 @@ class DanmuClient:
         Returns:
             响应JSON数据
         """
-        try:
-            # 添加API Key到请求参数
-            if params is None:
-                params = {}
-            if self.api_key:
-                params['api_key'] = self.api_key
+        return self._request_json(url, params)[0]
+
+    def _request_json(self, url: str, params: Optional[Dict] = None,
+                      etag: Optional[str] = None) -> tuple:
+        """发送HTTP请求，支持基于ETag的条件请求
+
+        多个线程同时请求相同的URL和参数时，只有第一个线程实际发送请求，其余线程等待并共享其结果
+
+        Args:
+            url: 请求URL
+            params: 请求参数
+            etag: 缓存数据的ETag，提供时发送If-None-Match
+
+        Returns:
+            (响应JSON数据, 响应ETag)；服务器返回304时数据为 NOT_MODIFIED
+        """
+        # 添加API Key到请求参数：无额外参数时直接复用预先生成的认证参数
+        if params:
+            params = {**params, **self._auth_params}
+            params_key = tuple(sorted(params.items()))
+        else:
+            params = self._auth_params
+            params_key = self._auth_params_key
 
-            response = self.session.get(url, params=params, timeout=30)
+        key = (url, params_key, etag)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_owner:
+            self.logger.debug("等待进行中的相同请求: %s", url)
+            return future.result()
+
+        try:
+            result = self._fetch_json(url, params, etag)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _fetch_json(self, url: str, params: Dict, etag: Optional[str] = None) -> tuple:
+        """实际发送GET请求并解析JSON响应，返回 (数据, ETag)"""
+        try:
+            headers = {'If-None-Match': etag} if etag else None
+            response = self.session.get(url, params=params, headers=headers, timeout=self.REQUEST_TIMEOUT)
+            if response.status_code == 304:
+                return self.NOT_MODIFIED, etag
             response.raise_for_status()
-            return response.json()
+            # orjson 直接解析响应字节，大体积弹幕数据解析更快
+            return orjson.loads(response.content), response.headers.get('ETag')
         except requests.exceptions.RequestException as e:
-            self.logger.error(f"请求失败: {url}, 错误: {e}")
+            # requests 的异常信息中包含带查询参数的完整URL，隐去API Key后再记录和抛出，
+            # 上层记录该异常时同样不会泄露
+            e.args = (self._redact(str(e)),)
+            self.logger.error("请求失败: %s, 错误: %s", url, e)
             raise
-        except json.JSONDecodeError as e:
-            self.logger.error(f"JSON解析失败: {e}")
+        except orjson.JSONDecodeError as e:
+            self.logger.error("JSON解析失败: %s", e)
             raise
 
     # ===== 缓存辅助方法 =====
@@ -165,13 +296,76 @@ class DanmuClient:
         """
         if not cache_entry.get('data'):
             return False
-        return (time.time() - cache_entry.get('timestamp', 0)) < ttl
+        # 使用单调时钟计算缓存年龄，不受系统时间调整影响
+        return (time.monotonic() - cache_entry.get('timestamp', 0)) < ttl
+
+    def _cache_get(self, cache: OrderedDict, key: str, ttl: int) -> Optional[Any]:
+        """读取有效的缓存数据，命中时更新LRU顺序
+
+        Returns:
+            缓存数据，未命中或已过期时返回None
+        """
+        with self._cache_lock:
+            cache_entry = cache.get(key)
+            if cache_entry is None or not self._is_cache_valid(cache_entry, ttl):
+                return None
+            cache.move_to_end(key)
+            return cache_entry['data']
+
+    def _cache_stale(self, cache: OrderedDict, key: str) -> tuple:
+        """获取缓存条目（包括已过期的）的数据和ETag，用于发送条件请求
+
+        Returns:
+            (缓存数据, ETag)，没有可用于条件请求的条目时返回 (None, None)
+        """
+        with self._cache_lock:
+            cache_entry = cache.get(key)
+            if not cache_entry or not cache_entry.get('data') or not cache_entry.get('etag'):
+                return None, None
+            return cache_entry['data'], cache_entry['etag']
+
+    def _cache_put(self, cache: OrderedDict, key: str, data: Any, etag: Optional[str] = None) -> None:
+        """写入缓存，超过最大条目数时淘汰最久未使用的条目"""
+        with self._cache_lock:
+            cache[key] = {'data': data, 'timestamp': time.monotonic(), 'etag': etag}
+            cache.move_to_end(key)
+            while len(cache) > self.CACHE_MAX_ENTRIES:
+                cache.popitem(last=False)
+
+    def invalidate_library(self) -> None:
+        """使作品列表缓存失效"""
+        with self._cache_lock:
+            self._library_cache = {'data': None, 'timestamp': 0}
+
+    def invalidate_sources(self, anime_id: Optional[int] = None) -> None:
+        """使弹幕源缓存失效
+
+        Args:
+            anime_id: 作品ID，为None时清空全部弹幕源缓存
+        """
+        with self._cache_lock:
+            if anime_id is None:
+                self._sources_cache.clear()
+            else:
+                self._sources_cache.pop(str(anime_id), None)
+
+    def invalidate_episodes(self, source_id: Optional[int] = None) -> None:
+        """使分集列表缓存失效
+
+        Args:
+            source_id: 数据源ID，为None时清空全部分集缓存
+        """
+        with self._cache_lock:
+            if source_id is None:
+                self._episodes_cache.clear()
+            else:
+                self._episodes_cache.pop(str(source_id), None)
 
     def clear_cache(self) -> None:
         """清空所有缓存"""
-        self._library_cache = {'data': None, 'timestamp': 0}
-        self._sources_cache.clear()
-        self._episodes_cache.clear()
+        self.invalidate_library()
+        self.invalidate_sources()
+        self.invalidate_episodes()
         self.logger.info("已清空所有缓存")
 
     def get_cache_stats(self) -> Dict[str, Any]:
@@ -180,7 +374,7 @@ class DanmuClient:
         Returns:
             Dict: 缓存统计信息
         """
-        current_time = time.time()
+        current_time = time.monotonic()
         return {
             'library_cache': {
                 'valid': self._is_cache_valid(self._library_cache, self.LIBRARY_CACHE_TTL),
@@ -190,6 +384,54 @@ class DanmuClient:
             'episodes_cache_count': len(self._episodes_cache)
         }
 
+    def _find_anime(self, animes: List[Dict[str, Any]], title: str, season: int) -> Optional[Dict[str, Any]]:
+        """在作品列表中查找指定标题和季数的作品，优先精确匹配，其次标题包含匹配
+
+        标题索引按作品列表对象缓存，作品列表缓存更新后自动重建
+        """
+        source, entries, exact = self._title_index
+        if source is not animes:
+            entries = [((anime.get('title') or '').lower(), anime.get('season', 1), anime)
+                       for anime in animes]
+            exact = {}
+            for anime_title, anime_season, anime in entries:
+                exact.setdefault((anime_title, anime_season), anime)
+            self._title_index = (animes, entries, exact)
+
+        title_lower = title.lower()
+        anime = exact.get((title_lower, season))
+        if anime is not None:
+            return anime
+        return next((anime for anime_title, anime_season, anime in entries
+                     if anime_season == season and title_lower in anime_title), None)
+
+    # ===== 日志辅助方法 =====
+
+    def _anime_title(self, anime_id: int) -> str:
+        """从缓存的作品列表中获取作品标题，用于日志显示"""
+        for anime in self._library_cache.get('data') or []:
+            if anime.get('animeId') == anime_id:
+                return anime.get('title', f'作品{anime_id}')
+        return "未知作品"
+
+    def _source_info(self, source_id: int) -> str:
+        """从缓存的弹幕源中获取数据源信息，用于日志显示"""
+        for sources_data in list(self._sources_cache.values()):
+            for source in sources_data.get('data', []):
+                if source.get('sourceId') == source_id:
+                    provider = source.get('providerName', '未知平台')
+                    media_id = source.get('mediaId', '')
+                    return f"{provider}({media_id}, ID: {source_id})"
+        return f"数据源{source_id}"
+
+    def _episode_title(self, episode_id: str) -> str:
+        """从缓存的分集列表中获取分集名称，用于日志显示"""
+        for episodes_data in list(self._episodes_cache.values()):
+            for episode in episodes_data.get('data', []):
+                if str(episode.get('episodeId')) == str(episode_id):
+                    return episode.get('title', f'第{episode.get("episodeIndex", "?")}集')
+        return f"分集{episode_id}"
+
     # ===== 新版API方法 (基于提供的四个接口) =====
 
     def get_library_list(self, use_cache: bool = True) -> Dict[str, Any]:
@@ -202,33 +444,41 @@ class DanmuClient:
             作品列表，包含animeId、title、season等信息
         """
         # 检查缓存
-        if use_cache and self._is_cache_valid(self._library_cache, self.LIBRARY_CACHE_TTL):
+        library_cache = self._library_cache
+        if use_cache and self._is_cache_valid(library_cache, self.LIBRARY_CACHE_TTL):
             self.logger.debug("使用缓存的作品列表数据")
-            cached_data = self._library_cache['data']
+            cached_data = library_cache['data']
             return {'success': True, 'animes': cached_data, 'from_cache': True}
 
-        # 获取base_url（self.config已经是danmu_api的内容）
-        base_url = self.config.get('base_url', '')
-
-        if not base_url:
+        if not self._base_url:
             raise ValueError(
                 "配置文件中缺少base_url (请在danmu_api.base_url或base_url中配置)")
 
-        url = base_url + self.LIBRARY_ENDPOINT
+        url = self._library_url
+
+        # 缓存过期但带有ETag时发送条件请求，数据未变化则复用缓存
+        stale_data, stale_etag = None, None
+        if use_cache and library_cache.get('data') and library_cache.get('etag'):
+            stale_data, stale_etag = library_cache['data'], library_cache['etag']
 
         self.logger.debug("从API获取弹幕库作品列表")
-        result = self._make_request(url)
+        result, etag = self._request_json(url, etag=stale_etag)
+        if result is self.NOT_MODIFIED:
+            self.logger.debug("作品列表未变化，继续使用缓存数据")
+            result = stale_data
 
         if isinstance(result, list):
-            self.logger.debug(f"获取到 {len(result)} 个作品")
+            self.logger.debug("获取到 %s 个作品", len(result))
             # 更新缓存
-            self._library_cache = {
-                'data': result,
-                'timestamp': time.time()
-            }
+            with self._cache_lock:
+                self._library_cache = {
+                    'data': result,
+                    'timestamp': time.monotonic(),
+                    'etag': etag
+                }
             return {'success': True, 'animes': result, 'from_cache': False}
         else:
-            self.logger.error(f"获取作品列表失败: {result}")
+            self.logger.error("获取作品列表失败: %s", result)
             return {'success': False, 'error': result}
 
     def get_anime_sources(self, anime_id: int, use_cache: bool = True) -> Dict[str, Any]:
@@ -243,59 +493,45 @@ class DanmuClient:
         """
         # 检查缓存
         cache_key = str(anime_id)
-        if use_cache and cache_key in self._sources_cache:
-            cache_entry = self._sources_cache[cache_key]
-            if self._is_cache_valid(cache_entry, self.SOURCES_CACHE_TTL):
-                # 尝试从缓存的作品列表中获取作品标题
-                anime_title = "未知作品"
-                if hasattr(self, '_library_cache') and self._library_cache:
-                    for anime in self._library_cache.get('data', []):
-                        if anime.get('animeId') == anime_id:
-                            anime_title = anime.get('title', f'作品{anime_id}')
-                            break
-                self.logger.debug(
-                    f"使用缓存的作品弹幕源数据: {anime_title} (ID: {anime_id})")
-                return {'success': True, 'sources': cache_entry['data'], 'from_cache': True}
-
-        # 获取base_url（self.config已经是danmu_api的内容）
-        base_url = self.config.get('base_url', '')
-
-        if not base_url:
+        cached_sources = self._cache_get(
+            self._sources_cache, cache_key, self.SOURCES_CACHE_TTL) if use_cache else None
+        if cached_sources is not None:
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("使用缓存的作品弹幕源数据: %s (ID: %s)",
+                                  self._anime_title(anime_id), anime_id)
+            return {'success': True, 'sources': cached_sources, 'from_cache': True}
+
+        if not self._base_url:
             raise ValueError(
                 "配置文件中缺少base_url (请在danmu_api.base_url或base_url中配置)")
 
-        url = base_url + f"{self.ANIME_SOURCES_ENDPOINT}/{anime_id}/sources"
+        url = self._sources_url_tmpl.format(anime_id)
 
-        # 尝试从缓存的作品列表中获取作品标题
-        anime_title = "未知作品"
-        if hasattr(self, '_library_cache') and self._library_cache:
-            for anime in self._library_cache.get('data', []):
-                if anime.get('animeId') == anime_id:
-                    anime_title = anime.get('title', f'作品{anime_id}')
-                    break
+        # 作品标题只用于调试日志，未开启DEBUG时不查找
+        anime_title = self._anime_title(anime_id) if self.logger.isEnabledFor(logging.DEBUG) else ''
 
-        self.logger.debug(f"从API获取作品弹幕源列表: {anime_title} (ID: {anime_id})")
-        result = self._make_request(url)
+        # 缓存过期但带有ETag时发送条件请求，数据未变化则复用缓存
+        stale_data, stale_etag = self._cache_stale(
+            self._sources_cache, cache_key) if use_cache else (None, None)
+
+        self.logger.debug("从API获取作品弹幕源列表: %s (ID: %s)", anime_title, anime_id)
+        result, etag = self._request_json(url, etag=stale_etag)
+        if result is self.NOT_MODIFIED:
+            self.logger.debug("弹幕源列表未变化，继续使用缓存数据: %s (ID: %s)", anime_title, anime_id)
+            result = stale_data
 
         if isinstance(result, list):
-            # 显示弹幕源的详细信息
-            source_info = []
-            for source in result:
-                provider = source.get('providerName', '未知平台')
-                media_id = source.get('mediaId', '')
-                episode_count = source.get('episodeCount', 0)
-                source_info.append(f"{provider}({media_id}, {episode_count}集)")
-
-            sources_detail = ", ".join(source_info) if source_info else "无详细信息"
-            self.logger.debug(f"获取到 {len(result)} 个弹幕源: {sources_detail}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                # 显示弹幕源的详细信息
+                sources_detail = ", ".join(
+                    f"{source.get('providerName', '未知平台')}({source.get('mediaId', '')}, "
+                    f"{source.get('episodeCount', 0)}集)" for source in result) or "无详细信息"
+                self.logger.debug("获取到 %s 个弹幕源: %s", len(result), sources_detail)
             # 更新缓存
-            self._sources_cache[cache_key] = {
-                'data': result,
-                'timestamp': time.time()
-            }
+            self._cache_put(self._sources_cache, cache_key, result, etag)
             return {'success': True, 'sources': result, 'from_cache': False}
         else:
-            self.logger.error(f"获取弹幕源失败: {result}")
+            self.logger.error("获取弹幕源失败: %s", result)
             return {'success': False, 'error': result}
 
     def get_source_episodes(self, source_id: int, use_cache: bool = True) -> Dict[str, Any]:
@@ -310,56 +546,39 @@ class DanmuClient:
         """
         # 检查缓存
         cache_key = str(source_id)
-        if use_cache and cache_key in self._episodes_cache:
-            cache_entry = self._episodes_cache[cache_key]
-            if self._is_cache_valid(cache_entry, self.EPISODES_CACHE_TTL):
-                # 尝试从缓存的弹幕源中获取数据源信息
-                source_info = f"数据源{source_id}"
-                if hasattr(self, '_sources_cache'):
-                    for sources_data in self._sources_cache.values():
-                        for source in sources_data.get('data', []):
-                            if source.get('sourceId') == source_id:
-                                provider = source.get('providerName', '未知平台')
-                                media_id = source.get('mediaId', '')
-                                source_info = f"{provider}({media_id}, ID: {source_id})"
-                                break
-                self.logger.debug(f"使用缓存的分集数据: {source_info}")
-                return {'success': True, 'episodes': cache_entry['data'], 'from_cache': True}
-
-        # 获取base_url（self.config已经是danmu_api的内容）
-        base_url = self.config.get('base_url', '')
-
-        if not base_url:
+        cached_episodes = self._cache_get(
+            self._episodes_cache, cache_key, self.EPISODES_CACHE_TTL) if use_cache else None
+        if cached_episodes is not None:
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("使用缓存的分集数据: %s", self._source_info(source_id))
+            return {'success': True, 'episodes': cached_episodes, 'from_cache': True}
+
+        if not self._base_url:
             raise ValueError(
                 "配置文件中缺少base_url (请在danmu_api.base_url或base_url中配置)")
 
-        url = base_url + \
-            f"{self.SOURCE_EPISODES_ENDPOINT}/{source_id}/episodes"
-
-        # 尝试从缓存的弹幕源中获取数据源信息
-        source_info = f"数据源{source_id}"
-        if hasattr(self, '_sources_cache'):
-            for sources_data in self._sources_cache.values():
-                for source in sources_data.get('data', []):
-                    if source.get('sourceId') == source_id:
-                        provider = source.get('providerName', '未知平台')
-                        media_id = source.get('mediaId', '')
-                        source_info = f"{provider}({media_id}, ID: {source_id})"
-                        break
-
-        self.logger.debug(f"从API获取分集列表: {source_info}")
-        result = self._make_request(url)
+        url = self._episodes_url_tmpl.format(source_id)
+
+        # 数据源信息只用于调试日志，未开启DEBUG时不查找
+        source_info = self._source_info(source_id) if self.logger.isEnabledFor(logging.DEBUG) else ''
+
+        # 缓存过期但带有ETag时发送条件请求，数据未变化则复用缓存
+        stale_data, stale_etag = self._cache_stale(
+            self._episodes_cache, cache_key) if use_cache else (None, None)
+
+        self.logger.debug("从API获取分集列表: %s", source_info)
+        result, etag = self._request_json(url, etag=stale_etag)
+        if result is self.NOT_MODIFIED:
+            self.logger.debug("分集列表未变化，继续使用缓存数据: %s", source_info)
+            result = stale_data
 
         if isinstance(result, list):
-            self.logger.debug(f"获取到 {len(result)} 个分集")
+            self.logger.debug("获取到 %s 个分集", len(result))
             # 更新缓存
-            self._episodes_cache[cache_key] = {
-                'data': result,
-                'timestamp': time.time()
-            }
+            self._cache_put(self._episodes_cache, cache_key, result, etag)
             return {'success': True, 'episodes': result, 'from_cache': False}
         else:
-            self.logger.error(f"获取分集列表失败: {result}")
+            self.logger.error("获取分集列表失败: %s", result)
             return {'success': False, 'error': result}
 
     def get_episode_danmaku(self, episode_id: str) -> Dict[str, Any]:
@@ -371,39 +590,50 @@ class DanmuClient:
         Returns:
             弹幕数据，包含count和comments列表
         """
-        # 优先使用danmu_api.base_url，然后是根级别的base_url
-        danmu_config = self.config.get('danmu_api', {})
-        base_url = danmu_config.get(
-            'base_url') or self.config.get('base_url', '')
-
-        if not base_url:
+        if not self._danmaku_base_url:
             raise ValueError(
                 "配置文件中缺少base_url (请在danmu_api.base_url或base_url中配置)")
 
-        url = base_url + f"{self.DANMAKU_ENDPOINT}/{episode_id}"
-
-        # 尝试从缓存中获取分集名称
-        episode_title = f"分集{episode_id}"
-        if hasattr(self, '_episodes_cache'):
-            for episodes_data in self._episodes_cache.values():
-                for episode in episodes_data.get('data', []):
-                    if str(episode.get('episodeId')) == str(episode_id):
-                        episode_title = episode.get(
-                            'title', f'第{episode.get("episodeIndex", "?")}集')
-                        break
+        url = self._danmaku_url_tmpl.format(episode_id)
 
-        self.logger.debug(f"获取分集弹幕数据: {episode_title} (ID: {episode_id})")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("获取分集弹幕数据: %s (ID: %s)", self._episode_title(episode_id), episode_id)
         result = self._make_request(url)
 
         if isinstance(result, dict) and 'count' in result:
             comment_count = result.get('count', 0)
-            self.logger.debug(f"获取到 {comment_count} 条弹幕")
+            self.logger.debug("获取到 %s 条弹幕", comment_count)
             return {'success': True, 'danmaku': result}
         else:
             self.logger.error(
-                f"获取分集弹幕数据失败: {episode_title} (ID: {episode_id}), 错误: {result}")
+                "获取分集弹幕数据失败: %s (ID: %s), 错误: %s",
+                self._episode_title(episode_id), episode_id, result)
             return {'success': False, 'error': result}
 
+    def get_episodes_danmaku(self, episode_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """并发获取多个分集的JSON弹幕数据，所有线程共用同一会话的连接池
+
+        Args:
+            episode_ids: 分集ID列表
+
+        Returns:
+            {分集ID: get_episode_danmaku 的返回结果}，单个分集失败不影响其他分集
+        """
+        def fetch(episode_id):
+            try:
+                return self.get_episode_danmaku(episode_id)
+            except Exception as e:
+                self.logger.error("获取分集弹幕数据失败 (ID: %s): %s", episode_id, e)
+                return {'success': False, 'error': str(e)}
+
+        episode_ids = list(dict.fromkeys(str(episode_id) for episode_id in episode_ids))
+        if len(episode_ids) <= 1:
+            return {episode_id: fetch(episode_id) for episode_id in episode_ids}
+
+        with ThreadPoolExecutor(
+                max_workers=min(self.MAX_DANMAKU_WORKERS, len(episode_ids))) as executor:
+            return dict(zip(episode_ids, executor.map(fetch, episode_ids)))
+
     def get_danmaku_by_title_and_episode(self, title: str, season: int = 1, episode_index: int = 1) -> Optional[Dict[str, Any]]:
         """根据作品标题、季数和集数获取弹幕数据 (完整流程)
 
@@ -422,80 +652,86 @@ class DanmuClient:
                 self.logger.error("获取作品列表失败")
                 return None
 
-            # 步骤2: 查找匹配的作品
-            target_anime = None
-            animes = library_result.get('animes', [])
-
-            for anime in animes:
-                anime_title = anime.get('title', '')
-                anime_season = anime.get('season', 1)
-
-                # 标题匹配 (支持模糊匹配)
-                if title.lower() in anime_title.lower() and anime_season == season:
-                    target_anime = anime
-                    break
+            # 步骤2: 查找匹配的作品 (支持模糊匹配)
+            target_anime = self._find_anime(library_result.get('animes', []), title, season)
 
             if not target_anime:
-                self.logger.warning(f"未找到匹配的作品: {title} 第{season}季")
+                self.logger.warning("未找到匹配的作品: %s 第%s季", title, season)
                 return None
 
             anime_id = target_anime.get('animeId')
-            self.logger.debug(
-                f"找到匹配作品: {target_anime.get('title')} (ID: {anime_id})")
+            self.logger.debug("找到匹配作品: %s (ID: %s)", target_anime.get('title'), anime_id)
 
             # 步骤3: 获取弹幕源列表
             sources_result = self.get_anime_sources(anime_id)
             if not sources_result.get('success'):
-                self.logger.error(f"获取作品 {anime_id} 的弹幕源失败")
+                self.logger.error("获取作品 %s 的弹幕源失败", anime_id)
                 return None
 
             sources = sources_result.get('sources', [])
             if not sources:
-                self.logger.warning(f"作品 {anime_id} 没有可用的弹幕源")
+                self.logger.warning("作品 %s 没有可用的弹幕源", anime_id)
                 return None
 
-            # 选择第一个弹幕源 (可以根据需要优化选择逻辑)
-            target_source = sources[0]
-            source_id = target_source.get('sourceId')
-            self.logger.debug(
-                f"使用弹幕源: {target_source.get('providerName')} (ID: {source_id})")
-
-            # 步骤4: 获取分集列表
-            episodes_result = self.get_source_episodes(source_id)
-            if not episodes_result.get('success'):
-                self.logger.error(f"获取数据源 {source_id} 的分集列表失败")
-                return None
+            # 步骤4: 并发获取所有弹幕源的分集列表
+            def fetch_source_episodes(source):
+                try:
+                    return self.get_source_episodes(source.get('sourceId'))
+                except Exception as e:
+                    return {'success': False, 'error': str(e)}
+
+            if len(sources) > 1:
+                with ThreadPoolExecutor(
+                        max_workers=min(self.MAX_SOURCE_WORKERS, len(sources))) as executor:
+                    results = list(executor.map(fetch_source_episodes, sources))
+            else:
+                results = [fetch_source_episodes(sources[0])]
 
-            # 步骤5: 查找指定集数
+            # 步骤5: 按弹幕源顺序查找指定集数，优先使用排在前面的弹幕源
             target_episode = None
-            episodes = episodes_result.get('episodes', [])
-
-            for episode in episodes:
-                if episode.get('episodeIndex') == episode_index:
-                    target_episode = episode
+            for source, episodes_result in zip(sources, results):
+                source_id = source.get('sourceId')
+                if not episodes_result.get('success'):
+                    self.logger.error("获取数据源 %s 的分集列表失败", source_id)
+                    continue
+
+                target_episode = next(
+                    (episode for episode in episodes_result.get('episodes', [])
+                     if episode.get('episodeIndex') == episode_index), None)
+                if target_episode:
+                    self.logger.debug(
+                        "使用弹幕源: %s (ID: %s)", source.get('providerName'), source_id)
                     break
 
             if not target_episode:
-                self.logger.warning(f"未找到第 {episode_index} 集")
+                self.logger.warning("未找到第 %s 集", episode_index)
                 return None
 
             episode_id = target_episode.get('episodeId')
             self.logger.debug(
-                f"找到目标分集: {target_episode.get('title')} (ID: {episode_id})")
+                "找到目标分集: %s (ID: %s)", target_episode.get('title'), episode_id)
 
             # 步骤6: 获取弹幕数据
             danmaku_result = self.get_episode_danmaku(str(episode_id))
             if danmaku_result.get('success'):
                 return danmaku_result.get('danmaku')
             else:
-                self.logger.error(f"获取分集 {episode_id} 的弹幕数据失败")
+                self.logger.error("获取分集 %s 的弹幕数据失败", episode_id)
                 return None
 
         except Exception as e:
-            self.logger.error(f"获取弹幕数据过程中发生错误: {e}")
+            self.logger.error("获取弹幕数据过程中发生错误: %s", e)
             return None
 
 
+def _dump(obj: Any) -> None:
+    """以缩进格式将JSON输出到标准输出（orjson 直接生成 UTF-8 字节，无需转义中文）"""
+    sys.stdout.flush()
+    sys.stdout.buffer.write(
+        orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS) + b'\n')
+    sys.stdout.buffer.flush()
+
+
 def main():
     """主函数，用于测试"""
     # 配置日志
@@ -516,11 +752,10 @@ def main():
     # 在作品列表中搜索匹配的动漫
     if library_result.get('success'):
         animes = library_result.get('animes', [])
-        matched_anime = None
-        for anime in animes:
-            if keyword.lower() in anime.get('title', '').lower():
-                matched_anime = anime
-                break
+        keyword_lower = keyword.lower()
+        matched_anime = next(
+            (anime for anime in animes
+             if keyword_lower in (anime.get('title') or '').lower()), None)
 
         if matched_anime:
             print(
@@ -535,7 +770,7 @@ def main():
         if anime_id:
             print(f"\n=== 获取动漫弹幕源: {anime_id} ===")
             sources_result = client.get_anime_sources(anime_id)
-            print(json.dumps(sources_result, ensure_ascii=False, indent=2))
+            _dump(sources_result)
 
             # 测试获取弹幕源
             if sources_result.get('success'):
@@ -546,8 +781,7 @@ def main():
 
                     print(f"\n=== 获取源分集列表: {source_id} ===")
                     episodes_result = client.get_source_episodes(source_id)
-                    print(json.dumps(episodes_result,
-                          ensure_ascii=False, indent=2))
+                    _dump(episodes_result)
 
                     if episodes_result.get('success'):
                         episodes = episodes_result.get('episodes', [])
@@ -558,8 +792,7 @@ def main():
                             print(f"\n=== 获取弹幕数据: {episode_id} ===")
                             danmaku_result = client.get_episode_danmaku(
                                 str(episode_id))
-                            print(json.dumps(danmaku_result,
-                                  ensure_ascii=False, indent=2))
+                            _dump(danmaku_result)
 
 
 def test_new_api():
@@ -16,8 +16,11 @@ from danmu.danmu_client import DanmuClient
 import sys
 import os
 import re
+import time
 import asyncio
+import functools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Union
 
@@ -28,6 +31,16 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # 设置日志
 logger = logging.getLogger('danmu_downloader')
 
+# 并发获取弹幕源分集列表的最大线程数
+MAX_SOURCE_WORKERS = 8
+
+
+@functools.lru_cache(maxsize=64)
+def _provider_suffix(provider_name: str) -> str:
+    """获取弹幕源对应的ID后缀（如 IqiyiID），未知弹幕源回退为腾讯"""
+    return DANMU_SOURCES.get(
+        provider_name.lower(), DANMU_SOURCES.get('tencent', 'TencentID'))
+
 
 class DanmuDownloader:
     """自动弹幕下载器，根据视频文件自动搜索和下载弹幕
@@ -77,6 +90,9 @@ class DanmuDownloader:
         # 缓存配置（默认启用缓存）
         self.use_cache = self.config.get('use_cache', True)
 
+        # 作品标题小写索引 (作品列表, [(小写标题, 作品)])，作品列表缓存未变化时直接复用
+        self._title_index = (None, [])
+
     def clear_cache(self) -> None:
         """清空弹幕客户端的所有缓存"""
         self.danmu_client.clear_cache()
@@ -99,7 +115,7 @@ class DanmuDownloader:
         self.use_cache = enabled
         logger.info(f"缓存已{'启用' if enabled else '禁用'}")
 
-    def process_video_file_sync(self, video_filepath: str) -> Dict[str, Any]:
+    def process_video_file_sync(self, video_filepath: str, force: bool = False) -> Dict[str, Any]:
         """同步版本的视频文件处理方法，用于在子线程中调用"""
         try:
             logger.info(f"开始处理视频文件: {video_filepath}")
@@ -125,9 +141,9 @@ class DanmuDownloader:
                     new_video_info = self.video_parser.parse_video_filename(video_filepath, content_type)
                     if new_video_info:
                         video_info = new_video_info
-                        logger.debug(f"重新解析后的视频信息: {video_info}")
+                        logger.debug("重新解析后的视频信息: %s", video_info)
 
-            logger.debug(f"视频解析结果: {video_info}")
+            logger.debug("视频解析结果: %s", video_info)
 
             # 2. 获取弹幕文件路径（强制覆盖模式）
             danmu_filepath = self.video_parser.get_danmu_filepath(
@@ -135,20 +151,35 @@ class DanmuDownloader:
                 self.danmu_sources[self.default_source]
             )
 
-            if os.path.exists(danmu_filepath):
+            # 2.1 弹幕文件已存在且在有效期内时直接跳过（0 表示总是强制覆盖）
+            freshness_sec = self.config.get('danmu_freshness_sec', 0)
+            if danmu_filepath and not force and freshness_sec > 0:
+                try:
+                    stat_result = os.stat(danmu_filepath)
+                except OSError:
+                    stat_result = None
+                if (stat_result and stat_result.st_size > 0
+                        and time.time() - stat_result.st_mtime < freshness_sec):
+                    logger.debug(f"弹幕文件已存在且未过期，跳过下载: {danmu_filepath}")
+                    return {
+                        'success': True,
+                        'skipped': True,
+                        'message': '弹幕文件已存在，跳过下载',
+                        'video_file': video_filepath,
+                        'danmu_file': danmu_filepath
+                    }
+
+            if danmu_filepath and os.path.exists(danmu_filepath):
                 logger.debug(f"弹幕文件已存在，将强制覆盖: {danmu_filepath}")
 
-            # 3. 确保有搜索结果（如果之前没有搜索到，再次尝试）
+            # 3. 确保有搜索结果（未搜索到时 video_info 未被重新解析，以相同参数重试结果不会改变）
             if not search_result:
-                search_result = self._search_anime(
-                    video_info['series_name'], video_info.get('season'))
-                if not search_result:
-                    content_type_msg = f"({video_info.get('content_type', '未知类型')})"
-                    return {
-                        'success': False,
-                        'message': f"未找到匹配的内容: {video_info['series_name']} 第{video_info.get('season', '?')}季 {content_type_msg}",
-                        'video_file': video_filepath
-                    }
+                content_type_msg = f"({video_info.get('content_type', '未知类型')})"
+                return {
+                    'success': False,
+                    'message': f"未找到匹配的内容: {video_info['series_name']} 第{video_info.get('season', '?')}季 {content_type_msg}",
+                    'video_file': video_filepath
+                }
 
             # 4. 获取分集信息
             all_episodes = self._get_episodes(search_result['animeId'])
@@ -163,22 +194,27 @@ class DanmuDownloader:
             downloaded_files = []
             failed_sources = []
 
+            # 5.1 为每个源匹配对应集数
+            target_episodes = {}
             for provider_name, episodes in all_episodes.items():
-                try:
-                    logger.debug(f"处理弹幕源: {provider_name}")
-
-                    # 匹配对应集数
-                    target_episode = self._match_episode(
-                        episodes, video_info['episode'])
-                    if not target_episode:
-                        logger.warning(
-                            f"{provider_name} 未找到第{video_info['episode']}集")
-                        failed_sources.append(f"{provider_name}: 未找到对应集数")
-                        continue
+                logger.debug("处理弹幕源: %s", provider_name)
+                target_episode = self._match_episode(
+                    episodes, video_info['episode'])
+                if not target_episode:
+                    logger.warning(
+                        f"{provider_name} 未找到第{video_info['episode']}集")
+                    failed_sources.append(f"{provider_name}: 未找到对应集数")
+                    continue
+                target_episodes[provider_name] = target_episode
+
+            # 5.2 并发下载所有源的弹幕
+            danmu_by_provider = self._download_danmu_batch(target_episodes)
 
-                    # 下载弹幕
-                    danmu_data = self._download_danmu(
-                        target_episode['episodeId'])
+            # 5.3 按源顺序保存弹幕文件（输出目录对所有源相同，直接使用解析文件名时得到的视频所在目录）
+            output_dir = video_info['file_dir']
+            for provider_name, target_episode in target_episodes.items():
+                try:
+                    danmu_data = danmu_by_provider.get(provider_name)
                     if not danmu_data:
                         logger.warning(f"{provider_name} 弹幕下载失败")
                         failed_sources.append(f"{provider_name}: 弹幕下载失败")
@@ -186,11 +222,10 @@ class DanmuDownloader:
 
                     # 根据providerName更新弹幕文件路径
                     danmu_filepath = self._get_correct_danmu_filepath(
-                        video_info, provider_name, video_filepath)
+                        video_info, provider_name, video_filepath, output_dir)
 
                     # 转换为XML并保存，使用ID格式的provider名称
-                    xml_provider_name = DANMU_SOURCES.get(
-                        provider_name.lower(), DANMU_SOURCES.get('tencent', 'TencentID'))
+                    xml_provider_name = _provider_suffix(provider_name)
                     xml_result = self._save_danmu_xml(
                         danmu_data, danmu_filepath, xml_provider_name)
                     if not xml_result:
@@ -203,7 +238,7 @@ class DanmuDownloader:
                         'file_path': danmu_filepath,
                         'danmu_count': danmu_data.get('count', 0) if isinstance(danmu_data, dict) else 0
                     })
-                    logger.debug(f"{provider_name} 弹幕处理完成: {danmu_filepath}")
+                    logger.debug("%s 弹幕处理完成: %s", provider_name, danmu_filepath)
 
                 except Exception as e:
                     logger.error(f"处理 {provider_name} 时出错: {e}")
@@ -245,7 +280,7 @@ class DanmuDownloader:
                 'video_file': video_filepath
             }
 
-    async def process_video_file(self, video_filepath: str) -> Dict[str, Any]:
+    async def process_video_file(self, video_filepath: str, force: bool = False) -> Dict[str, Any]:
         """
         处理单个视频文件，自动下载对应弹幕
 
@@ -258,10 +293,12 @@ class DanmuDownloader:
 
         Args:
             video_filepath: 视频文件路径
+            force: 是否忽略 danmu_freshness_sec，强制重新下载
 
         Returns:
             Dict[str, Any]: 处理结果，包含以下字段：
                 - success: 是否成功
+                - skipped: 弹幕文件未过期而跳过下载时为 True
                 - message: 处理结果消息
                 - video_file: 视频文件路径
                 - downloaded_files: 下载的弹幕文件列表（成功时）
@@ -270,149 +307,9 @@ class DanmuDownloader:
                 - episode: 集数（成功时）
                 - danmu_count: 弹幕数量（成功时）
         """
-        try:
-            logger.info(f"开始处理视频文件: {video_filepath}")
-
-            # 1. 先尝试解析视频文件名（不指定类型）
-            video_info = self.video_parser.parse_video_filename(video_filepath)
-            if not video_info:
-                return {
-                    'success': False,
-                    'message': '无法解析视频文件名',
-                    'video_file': video_filepath
-                }
-            
-            # 1.1 根据解析结果搜索内容，获取准确的类型信息
-            search_result = self._search_anime(
-                video_info['series_name'], video_info.get('season'))
-            
-            # 1.2 如果找到匹配内容且类型不同，重新解析
-            if search_result and search_result.get('type'):
-                content_type = search_result.get('type')
-                if content_type != video_info.get('content_type'):
-                    logger.debug(f"根据库中类型重新解析: {content_type}")
-                    new_video_info = self.video_parser.parse_video_filename(video_filepath, content_type)
-                    if new_video_info:
-                        video_info = new_video_info
-                        logger.debug(f"重新解析后的视频信息: {video_info}")
-
-            logger.debug(f"视频解析结果: {video_info}")
-
-            # 2. 获取弹幕文件路径（强制覆盖模式）
-            danmu_filepath = self.video_parser.get_danmu_filepath(
-                video_info,
-                self.danmu_sources[self.default_source]
-            )
-
-            if os.path.exists(danmu_filepath):
-                logger.debug(f"弹幕文件已存在，将强制覆盖: {danmu_filepath}")
-
-            # 3. 确保有搜索结果（如果之前没有搜索到，再次尝试）
-            if not search_result:
-                search_result = self._search_anime(
-                    video_info['series_name'], video_info.get('season'))
-                if not search_result:
-                    content_type_msg = f"({video_info.get('content_type', '未知类型')})"
-                    return {
-                        'success': False,
-                        'message': f"未找到匹配的内容: {video_info['series_name']} 第{video_info.get('season', '?')}季 {content_type_msg}",
-                        'video_file': video_filepath
-                    }
-
-            # 4. 获取分集信息
-            all_episodes = self._get_episodes(search_result['animeId'])
-            if not all_episodes:
-                return {
-                    'success': False,
-                    'message': '未找到分集信息',
-                    'video_file': video_filepath
-                }
-
-            # 5. 为每个源下载弹幕
-            downloaded_files = []
-            failed_sources = []
-
-            for provider_name, episodes in all_episodes.items():
-                try:
-                    logger.debug(f"处理弹幕源: {provider_name}")
-
-                    # 匹配对应集数
-                    target_episode = self._match_episode(
-                        episodes, video_info['episode'])
-                    if not target_episode:
-                        logger.warning(
-                            f"{provider_name} 未找到第{video_info['episode']}集")
-                        failed_sources.append(f"{provider_name}: 未找到对应集数")
-                        continue
-
-                    # 下载弹幕
-                    danmu_data = self._download_danmu(
-                        target_episode['episodeId'])
-                    if not danmu_data:
-                        logger.warning(f"{provider_name} 弹幕下载失败")
-                        failed_sources.append(f"{provider_name}: 弹幕下载失败")
-                        continue
-
-                    # 根据providerName更新弹幕文件路径
-                    danmu_filepath = self._get_correct_danmu_filepath(
-                        video_info, provider_name, video_filepath)
-
-                    # 转换为XML并保存，使用ID格式的provider名称
-                    xml_provider_name = DANMU_SOURCES.get(
-                        provider_name.lower(), DANMU_SOURCES.get('tencent', 'TencentID'))
-                    xml_result = self._save_danmu_xml(
-                        danmu_data, danmu_filepath, xml_provider_name)
-                    if not xml_result:
-                        logger.warning(f"{provider_name} XML文件保存失败")
-                        failed_sources.append(f"{provider_name}: XML保存失败")
-                        continue
-
-                    downloaded_files.append({
-                        'provider': provider_name,
-                        'file_path': danmu_filepath,
-                        'danmu_count': danmu_data.get('count', 0) if isinstance(danmu_data, dict) else 0
-                    })
-                    logger.debug(f"{provider_name} 弹幕处理完成: {danmu_filepath}")
-
-                except Exception as e:
-                    logger.error(f"处理 {provider_name} 时出错: {e}")
-                    failed_sources.append(f"{provider_name}: {str(e)}")
-
-            # 6. 返回结果
-            if downloaded_files:
-                success_message = f"成功下载 {len(downloaded_files)} 个弹幕源"
-                if failed_sources:
-                    success_message += f"，失败 {len(failed_sources)} 个源"
-
-                # 计算总弹幕数量
-                total_danmu_count = sum(file_info.get('danmu_count', 0)
-                                        for file_info in downloaded_files)
-
-                return {
-                    'success': True,
-                    'message': success_message,
-                    'video_file': video_filepath,
-                    'downloaded_files': downloaded_files,
-                    'failed_sources': failed_sources,
-                    'series_name': video_info['series_name'],
-                    'episode': video_info['episode'],
-                    'danmu_count': total_danmu_count
-                }
-            else:
-                return {
-                    'success': False,
-                    'message': f"所有弹幕源下载失败: {'; '.join(failed_sources)}",
-                    'video_file': video_filepath,
-                    'failed_sources': failed_sources
-                }
-
-        except Exception as e:
-            logger.error(f"处理视频文件时出错: {video_filepath}, 错误: {e}")
-            return {
-                'success': False,
-                'message': f'处理失败: {str(e)}',
-                'video_file': video_filepath
-            }
+        # 与同步版本共用同一套处理流程，在线程池中执行以免阻塞事件循环
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.process_video_file_sync, video_filepath, force)
 
     def _search_anime(self, series_name: str, season: Optional[int] = None) -> Optional[Dict[str, Any]]:
         """
@@ -443,16 +340,14 @@ class DanmuDownloader:
             logger.debug(f"获取到 {len(animes)} 个作品 {cache_info}")
 
             # 查找匹配的作品（支持模糊匹配和季数匹配）
+            series_lower = series_name.lower()
             matched_animes = []
-            for anime in animes:
-                anime_title = anime.get('title', '')
-                anime_season = anime.get('season', 1)
-
+            for title_lower, anime in self._get_title_index(animes):
                 # 标题匹配
-                if series_name.lower() in anime_title.lower() or anime_title.lower() in series_name.lower():
+                if series_lower in title_lower or title_lower in series_lower:
                     matched_animes.append(anime)
-                    logger.debug(
-                        f"找到匹配动漫: {anime_title}, 第{anime_season}季, ID: {anime.get('animeId')}")
+                    logger.debug("找到匹配动漫: %s, 第%s季, ID: %s",
+                                 anime.get('title', ''), anime.get('season', 1), anime.get('animeId'))
 
             if not matched_animes:
                 logger.warning(f"搜索无结果: {series_name}")
@@ -476,6 +371,14 @@ class DanmuDownloader:
             logger.error(f"搜索动漫时出错: {series_name}, 错误: {e}")
             return None
 
+    def _get_title_index(self, animes: List[Dict[str, Any]]) -> List[Any]:
+        """获取作品列表的小写标题索引，按作品列表对象缓存，作品列表缓存更新后自动重建"""
+        source, entries = self._title_index
+        if source is not animes:
+            entries = [(anime.get('title', '').lower(), anime) for anime in animes]
+            self._title_index = (animes, entries)
+        return entries
+
     def _get_episodes(self, anime_id):
         """
         获取动漫分集信息（使用新版API）
@@ -515,15 +418,26 @@ class DanmuDownloader:
 
             all_episodes = {}
 
+            def fetch_source_episodes(source):
+                source_id = source.get('sourceId')
+                logger.debug("获取弹幕源: %s (ID: %s)", source.get('providerName', 'unknown'), source_id)
+                # 获取该源的分集列表（使用缓存）
+                return self.danmu_client.get_source_episodes(
+                    source_id, use_cache=self.use_cache)
+
+            # 多个弹幕源时并发请求分集列表（共享客户端的连接池），结果保持原有顺序
+            if len(sources) > 1:
+                with ThreadPoolExecutor(
+                        max_workers=min(MAX_SOURCE_WORKERS, len(sources))) as executor:
+                    results = list(executor.map(fetch_source_episodes, sources))
+            else:
+                results = [fetch_source_episodes(source) for source in sources]
+
             # 遍历所有弹幕源
-            for source in sources:
+            for source, episodes_result in zip(sources, results):
                 source_id = source.get('sourceId')
                 provider_name = source.get('providerName', 'unknown')
-                logger.debug(f"获取弹幕源: {provider_name} (ID: {source_id})")
 
-                # 获取该源的分集列表（使用缓存）
-                episodes_result = self.danmu_client.get_source_episodes(
-                    source_id, use_cache=self.use_cache)
                 if not episodes_result.get('success'):
                     media_id = source.get('mediaId', '')
                     logger.warning(
@@ -540,8 +454,7 @@ class DanmuDownloader:
                         episode['providerName'] = provider_name
 
                     all_episodes[provider_name] = episodes
-                    logger.debug(
-                        f"{provider_name} 找到 {len(episodes)} 集 {cache_info}")
+                    logger.debug("%s 找到 %d 集 %s", provider_name, len(episodes), cache_info)
 
             if all_episodes:
                 logger.debug(f"总共获取到 {len(all_episodes)} 个弹幕源的数据")
@@ -567,44 +480,35 @@ class DanmuDownloader:
             dict: 匹配的分集信息或None
         """
         try:
-            logger.debug(f"匹配集数: {target_episode_num}")
+            logger.debug("匹配集数: %s", target_episode_num)
 
             # 优先使用 episodeIndex 字段进行精确匹配
             for episode in episodes:
                 episode_index = episode.get('episodeIndex')
                 if episode_index == target_episode_num:
                     episode_title = episode.get('title', episode.get('episodeTitle', 'Unknown'))
-                    logger.debug(f"通过episodeIndex匹配到集数: {episode_title} (索引: {episode_index})")
+                    logger.debug("通过episodeIndex匹配到集数: %s (索引: %s)", episode_title, episode_index)
                     return episode
 
             # 如果episodeIndex匹配失败，尝试从标题中提取集数
+            # 各种集数格式合并为一个正则（每次调用只编译一次），每个标题只扫描一遍
+            n = target_episode_num
+            pattern = re.compile(
+                rf'第\s*{n:02d}\s*集|第\s*{n}\s*集|EP\s*{n:02d}|EP\s*{n}|\b{n:02d}\b|\b{n}\b',
+                re.IGNORECASE)
+
             for episode in episodes:
                 episode_title = episode.get('title', episode.get('episodeTitle', ''))
 
-                # 尝试从标题中提取集数
-                import re
-
-                # 匹配各种集数格式
-                patterns = [
-                    rf'第\s*{target_episode_num}\s*集',
-                    rf'第\s*{target_episode_num:02d}\s*集',
-                    rf'EP\s*{target_episode_num:02d}',
-                    rf'EP\s*{target_episode_num}',
-                    rf'\b{target_episode_num:02d}\b',
-                    rf'\b{target_episode_num}\b'
-                ]
-
-                for pattern in patterns:
-                    if re.search(pattern, episode_title, re.IGNORECASE):
-                        logger.debug(f"通过标题匹配到集数: {episode_title}")
-                        return episode
+                if pattern.search(episode_title):
+                    logger.debug("通过标题匹配到集数: %s", episode_title)
+                    return episode
 
             # 如果按标题匹配失败，尝试按索引匹配（从1开始）
             if 1 <= target_episode_num <= len(episodes):
                 episode = episodes[target_episode_num - 1]
                 episode_title = episode.get('title', episode.get('episodeTitle', 'Unknown'))
-                logger.debug(
-                    f"按数组索引匹配到集数: {episode_title}")
+                logger.debug("按数组索引匹配到集数: %s", episode_title)
                 return episode
 
             logger.warning(f"未找到匹配的集数: {target_episode_num}")
@@ -614,6 +518,38 @@ class DanmuDownloader:
             logger.error(f"匹配集数时出错: {target_episode_num}, 错误: {e}")
             return None
 
+    def _download_danmu_batch(self, target_episodes):
+        """
+        并发下载多个弹幕源匹配到的分集弹幕
+
+        Args:
+            target_episodes: {provider_name: 匹配的分集信息}
+
+        Returns:
+            dict: {provider_name: 弹幕数据或None}
+        """
+        if len(target_episodes) <= 1:
+            return {provider_name: self._download_danmu(episode['episodeId'])
+                    for provider_name, episode in target_episodes.items()}
+
+        episode_ids = {provider_name: str(episode['episodeId'])
+                       for provider_name, episode in target_episodes.items()}
+        logger.debug(f"并发下载 {len(episode_ids)} 个弹幕源的弹幕")
+        results = self.danmu_client.get_episodes_danmaku(list(episode_ids.values()))
+
+        danmu_by_provider = {}
+        for provider_name, episode_id in episode_ids.items():
+            danmu_result = results.get(episode_id) or {}
+            if not danmu_result.get('success'):
+                logger.warning(f"弹幕下载失败: {episode_id}")
+                danmu_by_provider[provider_name] = None
+                continue
+            danmu_data = danmu_result.get('danmaku')
+            if danmu_data:
+                logger.debug("下载到 %s 条弹幕", danmu_data.get('count', 0))
+            danmu_by_provider[provider_name] = danmu_data
+        return danmu_by_provider
+
     def _download_danmu(self, episode_id):
         """
         下载弹幕数据（使用新版API）
@@ -625,7 +561,7 @@ class DanmuDownloader:
             dict: 弹幕数据或None
         """
         try:
-            logger.debug(f"下载弹幕: {episode_id}")
+            logger.debug("下载弹幕: %s", episode_id)
 
             # 使用新版API下载弹幕
             danmu_result = self.danmu_client.get_episode_danmaku(
@@ -638,7 +574,7 @@ class DanmuDownloader:
             danmu_data = danmu_result.get('danmaku')
             if danmu_data:
                 comment_count = danmu_data.get('count', 0)
-                logger.debug(f"下载到 {comment_count} 条弹幕")
+                logger.debug("下载到 %s 条弹幕", comment_count)
 
             return danmu_data
 
@@ -659,11 +595,7 @@ class DanmuDownloader:
             bool: 是否成功
         """
         try:
-            logger.debug(f"保存弹幕XML: {output_filepath}")
-
-            # 确保输出目录存在
-            output_dir = os.path.dirname(output_filepath)
-            os.makedirs(output_dir, exist_ok=True)
+            logger.debug("保存弹幕XML: %s", output_filepath)
 
             # 提取弹幕列表
             comments = danmu_data.get('comments', []) if isinstance(
@@ -678,7 +610,7 @@ class DanmuDownloader:
             )
 
             if success:
-                logger.debug(f"XML文件保存成功: {output_filepath}")
+                logger.debug("XML文件保存成功: %s", output_filepath)
                 return True
             else:
                 logger.error(f"XML文件保存失败: {output_filepath}")
@@ -688,7 +620,7 @@ class DanmuDownloader:
             logger.error(f"保存弹幕XML时出错: {output_filepath}, 错误: {e}")
             return False
 
-    def _get_correct_danmu_filepath(self, video_info, provider_name, video_filepath=None):
+    def _get_correct_danmu_filepath(self, video_info, provider_name, video_filepath=None, output_dir=None):
         """
         根据providerName生成正确的弹幕文件路径
 
@@ -696,13 +628,13 @@ class DanmuDownloader:
             video_info: 视频信息
             provider_name: 弹幕源名称
             video_filepath: 原始视频文件路径
+            output_dir: 预先解析的输出目录（可选，未提供时根据视频路径计算）
 
         Returns:
             str: 弹幕文件路径
         """
         # 获取对应的后缀，使用公共配置
-        suffix = DANMU_SOURCES.get(
-            provider_name.lower(), DANMU_SOURCES.get('tencent', 'TencentID'))
+        suffix = _provider_suffix(provider_name)
 
         # 生成文件名
         content_type = video_info.get('content_type', 'tv')
@@ -720,12 +652,13 @@ class DanmuDownloader:
             base_name = f"{video_info['series_name']} - S{season:02d}E{episode:02d} - 第 {episode} 集_{suffix}.xml"
 
         # 确定输出目录
-        if video_filepath:
-            output_dir = os.path.dirname(os.path.abspath(video_filepath))
-        else:
-            output_dir = os.path.dirname(video_info.get('filepath', '.'))
-            if not output_dir or output_dir == '':
-                output_dir = '.'
+        if not output_dir:
+            if video_filepath:
+                output_dir = os.path.dirname(os.path.abspath(video_filepath))
+            else:
+                output_dir = os.path.dirname(video_info.get('filepath', '.'))
+                if not output_dir or output_dir == '':
+                    output_dir = '.'
 
         # 返回完整路径
         return os.path.join(output_dir, base_name)
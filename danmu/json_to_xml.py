@@ -10,9 +10,70 @@ import logging
 import re
 import os
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-from xml.etree import ElementTree as ET
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+
+# XML转义表：一次 str.translate 同时完成特殊字符转义和XML 1.0非法字符
+# (除制表符/换行/回车外的控制字符、代理区字符、U+FFFE/U+FFFF) 的删除
+_XML_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&apos;',
+    **{c: None for c in range(0x20) if c not in (0x09, 0x0A, 0x0D)},
+    **{c: None for c in range(0xD800, 0xE000)},
+    0xFFFE: None, 0xFFFF: None
+})
+# 需要转义或删除的字符；大多数弹幕不含这些字符，先用一次C层扫描判断，可直接返回原字符串
+_XML_SPECIAL_RE = re.compile('[&<>"\'\x00-\x08\x0B\x0C\x0E-\x1F\uD800-\uDFFF\uFFFE\uFFFF]')
+
+# 通用格式XML的转义表，与 xml.etree.ElementTree 序列化时的转义规则一致：
+# 文本只转义 & < >，属性值另外转义双引号和制表符/换行/回车；同样删除XML 1.0非法字符
+_XML_ILLEGAL_CHARS = {
+    **{c: None for c in range(0x20) if c not in (0x09, 0x0A, 0x0D)},
+    **{c: None for c in range(0xD800, 0xE000)},
+    0xFFFE: None, 0xFFFF: None
+}
+_ET_TEXT_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;', '<': '&lt;', '>': '&gt;', **_XML_ILLEGAL_CHARS
+})
+_ET_TEXT_SPECIAL_RE = re.compile('[&<>\x00-\x08\x0B\x0C\x0E-\x1F\uD800-\uDFFF\uFFFE\uFFFF]')
+_ET_ATTR_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;',
+    '\r': '&#13;', '\n': '&#10;', '\t': '&#09;', **_XML_ILLEGAL_CHARS
+})
+_ET_ATTR_SPECIAL_RE = re.compile('[&<>"\x00-\x1F\uD800-\uDFFF\uFFFE\uFFFF]')
+
+
+def _et_escape_text(text: str) -> str:
+    """按 ElementTree 的规则转义元素文本"""
+    if _ET_TEXT_SPECIAL_RE.search(text) is None:
+        return text
+    return text.translate(_ET_TEXT_ESCAPE_TABLE)
+
+
+def _et_escape_attrib(text: str) -> str:
+    """按 ElementTree 的规则转义属性值"""
+    if _ET_ATTR_SPECIAL_RE.search(text) is None:
+        return text
+    return text.translate(_ET_ATTR_ESCAPE_TABLE)
+
+
+def _et_text_element(tag: str, text: Optional[str]) -> str:
+    """按 ElementTree 的规则序列化只含文本的元素，文本为空时输出自闭合标签"""
+    if text:
+        return f'<{tag}>{_et_escape_text(text)}</{tag}>'
+    return f'<{tag} />'
+
+
+# XML 1.0 规范允许的字符范围: #x9 | #xA | #xD | [#x20-#xD7FF] | [#xE000-#xFFFD] | [#x10000-#x10FFFF]
+# 此正则表达式匹配所有不在上述范围内的字符。
+_INVALID_XML_CHAR_RE = re.compile(
+    r'[^\x09\x0A\x0D\x20-\uD7FF\uE000-\uFFFD\U00010000-\U0010FFFF]'
+)
+
+# 弹幕数量超过该值时分批生成并写入XML，不在内存中拼接完整文档
+STREAM_WRITE_THRESHOLD = 10000
+# 分批写入时每批的XML片段数
+STREAM_WRITE_BATCH_SIZE = 4096
 
 
 class JsonToXmlConverter:
@@ -27,12 +88,7 @@ class JsonToXmlConverter:
         移除XML字符串中的无效字符以防止解析错误。
         此函数针对XML 1.0规范中非法的控制字符。
         """
-        # XML 1.0 规范允许的字符范围: #x9 | #xA | #xD | [#x20-#xD7FF] | [#xE000-#xFFFD] | [#x10000-#x10FFFF]
-        # 此正则表达式匹配所有不在上述范围内的字符。
-        invalid_xml_char_re = re.compile(
-            r'[^\x09\x0A\x0D\x20-\uD7FF\uE000-\uFFFD\U00010000-\U0010FFFF]'
-        )
-        return invalid_xml_char_re.sub('', xml_string)
+        return _INVALID_XML_CHAR_RE.sub('', xml_string)
 
     def xml_escape(self, text: str) -> str:
         """
@@ -41,17 +97,10 @@ class JsonToXmlConverter:
         if not text:
             return ''
 
-        # 先清理无效字符
-        text = self.clean_xml_string(text)
-
-        # 转义XML特殊字符
-        text = text.replace('&', '&amp;')
-        text = text.replace('<', '&lt;')
-        text = text.replace('>', '&gt;')
-        text = text.replace('"', '&quot;')
-        text = text.replace("'", '&apos;')
-
-        return text
+        # 单次扫描完成无效字符清理和特殊字符转义
+        if _XML_SPECIAL_RE.search(text) is None:
+            return text
+        return text.translate(_XML_ESCAPE_TABLE)
 
     def generate_xml_from_comments(
         self,
@@ -64,29 +113,67 @@ class JsonToXmlConverter:
         根据弹幕字典列表生成符合dandanplay标准的XML字符串。
         完全仿照misaka_danmu_server的实现
         """
-        root = ET.Element('i')
-        ET.SubElement(root, 'chatserver').text = chat_server
-        ET.SubElement(root, 'chatid').text = str(episode_id)
-        ET.SubElement(root, 'mission').text = '0'
-        ET.SubElement(root, 'maxlimit').text = '2000'
-        ET.SubElement(root, 'source').text = 'k-v'  # 保持与官方格式一致
-        # 新增字段
-        ET.SubElement(root, 'sourceprovider').text = provider_name
-        ET.SubElement(root, 'datasize').text = str(len(comments))
+        return self._build_xml_from_pairs(
+            [(comment.get('p', ''), comment.get('m', '')) for comment in comments],
+            episode_id, provider_name, chat_server)
 
-        for comment in comments:
-            p_attr = str(comment.get('p', ''))
-            d = ET.SubElement(root, 'd', p=p_attr)
-            d.text = comment.get('m', '')
+    def _build_xml_from_pairs(
+        self,
+        comments: List[Tuple[Any, str]],
+        episode_id: int = 0,
+        provider_name: Optional[str] = "misaka",
+        chat_server: Optional[str] = "danmaku.misaka.org"
+    ) -> str:
+        """根据 (p, m) 二元组列表生成符合dandanplay标准的XML字符串"""
+        return ''.join(self._iter_xml_parts(comments, episode_id, provider_name, chat_server))
 
-        return ET.tostring(root, encoding='unicode', xml_declaration=True)
+    def _iter_xml_parts(
+        self,
+        comments: List[Tuple[Any, str]],
+        episode_id: int = 0,
+        provider_name: Optional[str] = "misaka",
+        chat_server: Optional[str] = "danmaku.misaka.org"
+    ) -> Iterator[str]:
+        """逐段生成 _build_xml_from_pairs 的XML文本片段（片段之间无分隔符）"""
+        # 直接拼接XML文本，不构建元素树；声明、排版和转义规则与
+        # ElementTree.tostring(root, encoding='unicode', xml_declaration=True) 的输出一致
+        escape = _et_escape_text
+        escape_attrib = _et_escape_attrib
+        yield from (
+            "<?xml version='1.0' encoding='utf-8'?>\n",
+            '<i>',
+            _et_text_element('chatserver', chat_server),
+            _et_text_element('chatid', str(episode_id)),
+            '<mission>0</mission>',
+            '<maxlimit>2000</maxlimit>',
+            '<source>k-v</source>',  # 保持与官方格式一致
+            # 新增字段
+            _et_text_element('sourceprovider', provider_name),
+            f'<datasize>{len(comments)}</datasize>'
+        )
+        for p_attr, text in comments:
+            if text:
+                yield f'<d p="{escape_attrib(str(p_attr))}">{escape(text)}</d>'
+            else:
+                yield f'<d p="{escape_attrib(str(p_attr))}" />'
+        yield '</i>'
 
     def generate_dandan_xml(self, comments: List[dict], provider_name: str = "aiqiyi") -> str:
         """
         根据弹幕字典列表生成 dandanplay 格式的 XML 字符串。
         完全仿照misaka_danmu_server的_generate_dandan_xml函数
         """
-        xml_parts = [
+        return self._build_dandan_xml_from_pairs(
+            [(comment.get('p', '0,1,25,16777215'), comment.get('m', '')) for comment in comments],
+            provider_name)
+
+    def _build_dandan_xml_from_pairs(self, comments: List[Tuple[str, str]], provider_name: str = "aiqiyi") -> str:
+        """根据 (p, m) 二元组列表生成 dandanplay 格式的 XML 字符串"""
+        return '\n'.join(self._iter_dandan_xml_lines(comments, provider_name))
+
+    def _iter_dandan_xml_lines(self, comments: List[Tuple[str, str]], provider_name: str = "aiqiyi") -> Iterator[str]:
+        """逐行生成 _build_dandan_xml_from_pairs 的XML文本（不含换行符）"""
+        yield from (
             '<?xml version="1.0" encoding="utf-8"?>',
             '<i>',
             '    <chatid>0</chatid>',
@@ -98,21 +185,25 @@ class JsonToXmlConverter:
             '    <state>0</state>',
             '    <real_name>0</real_name>',
             '    <source>k-v</source>'
-        ]
+        )
 
-        for comment in comments:
-            content = self.xml_escape(comment.get('m', ''))
-            p_attr_str = comment.get('p', '0,1,25,16777215')
-            p_parts = p_attr_str.split(',')
+        for p_attr_str, text in comments:
+            content = self.xml_escape(text)
 
             # 强制修复逻辑：确保 p 属性的格式为 时间,模式,字体大小,颜色,...
-            core_parts_end_index = len(p_parts)
-            for i, part in enumerate(p_parts):
-                if '[' in part and ']' in part:
-                    core_parts_end_index = i
-                    break
-            core_parts = p_parts[:core_parts_end_index]
-            optional_parts = p_parts[core_parts_end_index:]
+            # 绝大多数弹幕不含 [xxx] 形式的可选字段，整串检查一次即可跳过逐段扫描
+            if '[' not in p_attr_str:
+                core_parts = p_attr_str.split(',')
+                optional_parts = None
+            else:
+                p_parts = p_attr_str.split(',')
+                core_parts_end_index = len(p_parts)
+                for i, part in enumerate(p_parts):
+                    if '[' in part and ']' in part:
+                        core_parts_end_index = i
+                        break
+                core_parts = p_parts[:core_parts_end_index]
+                optional_parts = p_parts[core_parts_end_index:]
 
             # 场景1: 缺少字体大小 (e.g., "1.23,1,16777215")
             if len(core_parts) == 3:
@@ -121,11 +212,10 @@ class JsonToXmlConverter:
             elif len(core_parts) == 4 and (not core_parts[2] or not core_parts[2].strip().isdigit()):
                 core_parts[2] = '25'
 
-            final_p_attr = ','.join(core_parts + optional_parts)
-            xml_parts.append(f'  <d p="{final_p_attr}">{content}</d>')
+            final_p_attr = ','.join(core_parts + optional_parts if optional_parts else core_parts)
+            yield f'  <d p="{final_p_attr}">{content}</d>'
 
-        xml_parts.append('</i>')
-        return '\n'.join(xml_parts)
+        yield '</i>'
 
     def convert_json_to_xml(
         self,
@@ -181,39 +271,82 @@ class JsonToXmlConverter:
                 self.logger.warning("未找到弹幕数据")
                 return False
 
-            # 标准化弹幕格式
+            # 标准化弹幕格式为 (p, m) 二元组，避免为每条弹幕创建字典
             normalized_comments = self._normalize_comments(comments)
 
-            # 生成XML
+            # 生成XML片段
             if use_dandan_format:
-                xml_content = self.generate_dandan_xml(
+                xml_parts = self._iter_dandan_xml_lines(
                     normalized_comments, provider_name)
+                separator = '\n'
             else:
-                xml_content = self.generate_xml_from_comments(
+                xml_parts = self._iter_xml_parts(
                     normalized_comments, episode_id, provider_name)
+                separator = ''
 
             # 确保输出目录存在
             output_dir = os.path.dirname(output_path)
             if output_dir:
                 os.makedirs(output_dir, exist_ok=True)
 
-            # 写入文件
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(xml_content)
+            # 写入文件：以二进制模式写入预先编码的字节，省去文本层的换行转换和分块编码；
+            # 弹幕较少时一次写入，数量很大时分批生成和写入，避免同时持有完整的文档字符串和字节串。
+            # XML片段是边生成边写入的，先写入同目录下的临时文件，全部成功后再原子替换目标文件，
+            # 生成过程中出错时不会留下空的或不完整的文件，也不会破坏已有的弹幕文件
+            tmp_path = output_path + '.tmp'
+            try:
+                with open(tmp_path, 'wb', buffering=1 << 20) as f:
+                    if len(normalized_comments) <= STREAM_WRITE_THRESHOLD:
+                        f.write(separator.join(xml_parts).encode('utf-8'))
+                    else:
+                        self._write_parts(f, xml_parts, separator)
+                os.replace(tmp_path, output_path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
 
-            self.logger.info(
-                f"成功转换 {len(normalized_comments)} 条弹幕到 {output_path}")
+            self.logger.debug(
+                "成功转换 %d 条弹幕到 %s", len(normalized_comments), output_path)
             return True
 
         except Exception as e:
             self.logger.error(f"转换失败: {e}")
             return False
 
-    def _normalize_comments(self, comments: List[Any]) -> List[Dict[str, Any]]:
+    def _write_parts(self, f, xml_parts: Iterator[str], separator: str) -> None:
+        """分批拼接XML片段并写入二进制文件，结果与 separator.join(xml_parts) 一致"""
+        encoded_separator = separator.encode('utf-8')
+        first = True
+        for batch in iter(lambda: list(islice(xml_parts, STREAM_WRITE_BATCH_SIZE)), []):
+            if not first:
+                f.write(encoded_separator)
+            f.write(separator.join(batch).encode('utf-8'))
+            first = False
+
+    def _normalize_comments(self, comments: List[Any]) -> List[Tuple[str, str]]:
         """
         标准化弹幕数据格式
-        将各种可能的弹幕格式转换为统一的内部格式
+        将各种可能的弹幕格式转换为统一的内部格式: (p属性, 弹幕文本) 二元组
         """
+        # 快速路径：弹幕服务器返回的数据已是 p、m 均为字符串的 {p, m} 格式，直接提取；
+        # 逐条检查类型，遇到第一条不符合该格式的弹幕即回退到逐条标准化
+        fast = []
+        append = fast.append
+        for comment in comments:
+            if type(comment) is not dict:
+                break
+            p_attr = comment.get('p')
+            text = comment.get('m')
+            if type(p_attr) is not str or type(text) is not str:
+                break
+            if text:
+                append((p_attr, text))
+        else:
+            return fast
+
         normalized = []
 
         for i, comment in enumerate(comments):
@@ -227,10 +360,8 @@ class JsonToXmlConverter:
                     normalized_comment = self._normalize_array_comment(comment)
                 else:
                     # 其他格式，创建默认弹幕
-                    normalized_comment = {
-                        'p': f'{i * 5},1,25,16777215,0,0,0,{i}',
-                        'm': str(comment)
-                    }
+                    normalized_comment = (
+                        f'{i * 5},1,25,16777215,0,0,0,{i}', str(comment))
 
                 if normalized_comment:
                     normalized.append(normalized_comment)
@@ -241,10 +372,17 @@ class JsonToXmlConverter:
 
         return normalized
 
-    def _normalize_single_comment(self, comment: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def _normalize_single_comment(self, comment: Dict[str, Any]) -> Optional[Tuple[str, str]]:
         """
         标准化单条弹幕（字典格式）
         """
+        # 快速路径：API 返回的弹幕均已包含 p 和 m 字段
+        text = comment.get('m')
+        if text and type(text) is str:
+            p_attr = comment.get('p')
+            if p_attr is not None:
+                return (p_attr if type(p_attr) is str else str(p_attr)), text
+
         # 提取弹幕文本
         text = ''
         for key in ['m', 'text', 'content', 'message', 'danmaku']:
@@ -271,12 +409,9 @@ class JsonToXmlConverter:
 
             p_attr = f'{time_sec},{mode},{fontsize},{color},{timestamp},{pool},{user_id},{cid}'
 
-        return {
-            'p': p_attr,
-            'm': text
-        }
+        return p_attr, text
 
-    def _normalize_array_comment(self, comment: List[Any]) -> Optional[Dict[str, Any]]:
+    def _normalize_array_comment(self, comment: List[Any]) -> Optional[Tuple[str, str]]:
         """
         标准化数组格式的弹幕
         通常格式为: [时间, 模式, 字体大小, 颜色, 弹幕文本, ...]
@@ -290,8 +425,7 @@ class JsonToXmlConverter:
         # 构造p属性
         if len(comment) >= 5:
             # 完整格式
-            p_parts = [str(x) for x in comment[:-1]]
-            p_attr = ','.join(p_parts)
+            p_attr = ','.join(map(str, comment[:-1]))
         else:
             # 简化格式，补充默认值
             time_sec = comment[0] if len(comment) > 0 else 0
@@ -301,10 +435,7 @@ class JsonToXmlConverter:
 
             p_attr = f'{time_sec},{mode},{fontsize},{color},0,0,0,0'
 
-        return {
-            'p': p_attr,
-            'm': text
-        }
+        return p_attr, text
 
     def create_test_json_data(self) -> List[Dict[str, Any]]:
         """
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+json弹幕转xml测试脚本
+
+测试JsonToXmlConverter写入XML文件和标准化弹幕数据的行为
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 直接导入JsonToXmlConverter，避免通过__init__.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'danmu'))
+from json_to_xml import JsonToXmlConverter
+
+
+def test_failed_conversion_keeps_existing_xml():
+    """生成XML过程中出错时，已有的弹幕文件保持不变，也不残留临时文件"""
+    converter = JsonToXmlConverter()
+
+    def failing_lines(comments, provider_name):
+        yield '<?xml version="1.0" encoding="utf-8"?>'
+        yield '<i>'
+        raise RuntimeError('生成失败')
+
+    converter._iter_dandan_xml_lines = failing_lines
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'video.xml')
+        with open(output_path, 'wb') as f:
+            f.write(b'<i>old</i>')
+
+        comments = [{'p': '1.0,1,25,16777215', 'm': '弹幕'}]
+        assert converter.convert_json_to_xml(comments, output_path) is False
+
+        with open(output_path, 'rb') as f:
+            assert f.read() == b'<i>old</i>'
+        assert os.listdir(tmp_dir) == ['video.xml']
+
+
+def test_successful_conversion_replaces_existing_xml():
+    """转换成功时替换已有的弹幕文件"""
+    converter = JsonToXmlConverter()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'video.xml')
+        with open(output_path, 'wb') as f:
+            f.write(b'<i>old</i>')
+
+        comments = [{'p': '1.0,1,25,16777215', 'm': '新弹幕'}]
+        assert converter.convert_json_to_xml(comments, output_path) is True
+
+        with open(output_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        assert '新弹幕' in content
+        assert os.listdir(tmp_dir) == ['video.xml']
+
+
+def test_mixed_type_comments_are_normalized():
+    """首条弹幕为 {p, m} 字符串格式、后续弹幕字段类型不同时，逐条转换为字符串"""
+    converter = JsonToXmlConverter()
+    comments = [
+        {'p': '1.0,1,25,16777215', 'm': '第一条'},
+        {'p': [2.0, 1, 25, 16777215], 'm': '列表p'},
+        {'p': 1.5, 'm': '数字p'},
+        {'p': '3.0,1,25,16777215', 'm': 5},
+    ]
+
+    normalized = converter._normalize_comments(comments)
+    assert all(type(p) is str and type(m) is str for p, m in normalized)
+    assert normalized == [
+        ('1.0,1,25,16777215', '第一条'),
+        ('[2.0, 1, 25, 16777215]', '列表p'),
+        ('1.5', '数字p'),
+        ('3.0,1,25,16777215', '5'),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'video.xml')
+        assert converter.convert_json_to_xml(comments, output_path) is True
+        assert converter.convert_json_to_xml(
+            comments, output_path, use_dandan_format=False) is True
+
+
+def main():
+    """主测试函数"""
+    print("开始测试json弹幕转xml...")
+    test_failed_conversion_keeps_existing_xml()
+    test_successful_conversion_replaces_existing_xml()
+    test_mixed_type_comments_are_normalized()
+    print("✓ 所有测试通过")
+
+
+if __name__ == "__main__":
+    main()
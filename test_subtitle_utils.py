@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XML弹幕文件修改测试脚本
+
+测试modify_xml对已符合要求、格式错误以及注释中出现sourceprovider的XML文件的处理
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 直接导入subtitle_utils，避免通过__init__.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'utils'))
+from subtitle_utils import modify_xml
+
+CONFORMING_XML = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<i><sourceprovider>iqiyi</sourceprovider>'
+    '<body type="subtitle"><d p="1.0,1,25,16777215">弹幕</d></body></i>'
+).encode('utf-8')
+
+
+def _write(tmp_dir, data):
+    filepath = os.path.join(tmp_dir, 'video.xml')
+    with open(filepath, 'wb') as f:
+        f.write(data)
+    return filepath
+
+
+def test_conforming_xml_is_unchanged():
+    """已符合要求的文件不做修改"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = _write(tmp_dir, CONFORMING_XML)
+        assert modify_xml(filepath) is False
+        with open(filepath, 'rb') as f:
+            assert f.read() == CONFORMING_XML
+
+
+def test_truncated_xml_is_error():
+    """截断的XML即使已包含sourceprovider和subtitle类型的body，也返回错误"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = _write(tmp_dir, CONFORMING_XML[:-len(b'</body></i>')])
+        result = modify_xml(filepath)
+        assert isinstance(result, tuple) and result[0] == 'error'
+
+
+def test_malformed_xml_is_error():
+    """格式错误的XML返回错误，不被当作已符合要求"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = _write(tmp_dir, CONFORMING_XML.replace(b'</body>', b'</bdy>'))
+        result = modify_xml(filepath)
+        assert isinstance(result, tuple) and result[0] == 'error'
+
+
+def test_sourceprovider_in_comment_is_added():
+    """sourceprovider只出现在注释中时，仍会添加sourceprovider标签"""
+    data = CONFORMING_XML.replace(
+        b'<sourceprovider>iqiyi</sourceprovider>',
+        b'<!-- <sourceprovider>iqiyi</sourceprovider> -->')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = _write(tmp_dir, data)
+        assert modify_xml(filepath) is True
+        files = os.listdir(tmp_dir)
+        assert len(files) == 1 and not files[0].endswith('.tmp')
+        with open(os.path.join(tmp_dir, files[0]), 'rb') as f:
+            content = f.read()
+        assert b'<i><sourceprovider>' in content
+
+
+def test_failed_write_leaves_no_tmp_file():
+    """写入失败时返回错误，原文件保持不变，也不残留临时文件"""
+    data = CONFORMING_XML.replace(b'type="subtitle"', b'type="text"')
+    original_replace = os.replace
+
+    def failing_replace(src, dst):
+        raise OSError(28, 'No space left on device', dst)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = _write(tmp_dir, data)
+        os.replace = failing_replace
+        try:
+            result = modify_xml(filepath)
+        finally:
+            os.replace = original_replace
+
+        assert isinstance(result, tuple) and result[0] == 'error'
+        assert os.listdir(tmp_dir) == ['video.xml']
+        with open(filepath, 'rb') as f:
+            assert f.read() == data
+
+
+def main():
+    """主测试函数"""
+    print("开始测试XML弹幕文件修改...")
+    test_conforming_xml_is_unchanged()
+    test_truncated_xml_is_error()
+    test_malformed_xml_is_error()
+    test_sourceprovider_in_comment_is_added()
+    test_failed_write_leaves_no_tmp_file()
+    print("✓ 所有测试通过")
+
+
+if __name__ == "__main__":
+    main()
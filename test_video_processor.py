@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频目录遍历测试脚本
+
+测试_iter_files在子目录无法读取时跳过该子目录、顶层目录出错时抛出异常的行为
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import video_processor
+
+
+def _touch(path):
+    with open(path, 'wb'):
+        pass
+
+
+def _make_tree(tmp_dir):
+    """创建测试目录树: a.mkv, locked/b.mkv, sub/c.mkv"""
+    _touch(os.path.join(tmp_dir, 'a.mkv'))
+    for name, filename in (('locked', 'b.mkv'), ('sub', 'c.mkv')):
+        os.mkdir(os.path.join(tmp_dir, name))
+        _touch(os.path.join(tmp_dir, name, filename))
+    return os.path.join(tmp_dir, 'locked')
+
+
+def test_unreadable_subdirectory_is_skipped():
+    """子目录无法读取时跳过该子目录，继续遍历其余目录"""
+    original_scan = video_processor._scan_dir
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        locked = _make_tree(tmp_dir)
+
+        def scan(root, exts_tuple):
+            if root == locked:
+                raise PermissionError(13, 'Permission denied', root)
+            return original_scan(root, exts_tuple)
+
+        video_processor._scan_dir = scan
+        try:
+            files = list(video_processor._iter_files(tmp_dir, ('.mkv',)))
+        finally:
+            video_processor._scan_dir = original_scan
+
+        assert sorted(os.path.relpath(f, tmp_dir) for f in files) == [
+            'a.mkv', os.path.join('sub', 'c.mkv')]
+
+
+def test_unreadable_subdirectory_is_skipped_with_chmod():
+    """通过权限位设置不可读子目录（root 用户不受权限位限制，跳过）"""
+    if not hasattr(os, 'geteuid') or os.geteuid() == 0:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        locked = _make_tree(tmp_dir)
+        os.chmod(locked, 0)
+        try:
+            files = list(video_processor._iter_files(tmp_dir, ('.mkv',)))
+        finally:
+            os.chmod(locked, 0o755)
+
+        assert sorted(os.path.relpath(f, tmp_dir) for f in files) == [
+            'a.mkv', os.path.join('sub', 'c.mkv')]
+
+
+def test_root_errors_are_raised():
+    """顶层目录不存在或不是目录时抛出异常"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        missing = os.path.join(tmp_dir, 'missing')
+        regular_file = os.path.join(tmp_dir, 'a.mkv')
+        _touch(regular_file)
+
+        for path, expected in ((missing, FileNotFoundError),
+                               (regular_file, NotADirectoryError)):
+            try:
+                list(video_processor._iter_files(path, ('.mkv',)))
+            except expected:
+                pass
+            else:
+                raise AssertionError(f"未抛出 {expected.__name__}: {path}")
+
+
+def main():
+    """主测试函数"""
+    print("开始测试视频目录遍历...")
+    test_unreadable_subdirectory_is_skipped()
+    test_unreadable_subdirectory_is_skipped_with_chmod()
+    test_root_errors_are_raised()
+    print("✓ 所有测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,25 +4,27 @@ from .watcher import (
     start_watcher, stop_watcher, restart_watcher, is_running,
     get_processed_files, clear_processed_files, get_config, save_config,
     update_config, get_status, log_message, load_config, setup_logger,
-    add_processed_file, get_beijing_formatter
+    add_processed_file, get_beijing_formatter, flush_logs,
+    get_recent_logs, clear_recent_logs
 )
 
 # 字幕处理相关功能
 from .subtitle_utils import modify_xml, create_test_xml, create_test_video
 
 # 视频处理相关功能
-from .video_processor import process_directory_with_logging
+from .video_processor import process_directory_with_logging, get_video_extensions
 
 __all__ = [
     # 文件监控相关功能
     'start_watcher', 'stop_watcher', 'restart_watcher', 'is_running',
     'get_processed_files', 'clear_processed_files', 'get_config', 'save_config',
     'update_config', 'get_status', 'log_message', 'load_config', 'setup_logger',
-    'add_processed_file', 'get_beijing_formatter',
+    'add_processed_file', 'get_beijing_formatter', 'flush_logs',
+    'get_recent_logs', 'clear_recent_logs',
 
     # 字幕处理相关功能
     'modify_xml', 'create_test_xml', 'create_test_video',
 
     # 视频处理相关功能
-    'process_directory_with_logging'
+    'process_directory_with_logging', 'get_video_extensions'
 ]
@@ -5,10 +5,17 @@
 """
 
 import os
-import glob
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from .watcher import get_config, log_message
 
+# 并发删除的最大线程数（unlink 为 I/O 操作，线程数可高于CPU核数）
+MAX_DELETE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# 当前平台是否支持基于目录文件描述符的 unlink（Windows 不支持）
+_UNLINK_DIR_FD = os.unlink in os.supports_dir_fd and hasattr(os, 'O_DIRECTORY')
+
 
 def get_watch_directories():
     """获取监听目录列表
@@ -22,6 +29,39 @@ def get_watch_directories():
     return ['./videos', './test_videos']
 
 
+def _iter_ass_files(root):
+    """使用 os.scandir 迭代遍历目录树，产出所有ass文件路径
+    
+    与 glob 的 '**/*.ass' 一致，跳过以点开头的隐藏文件和目录；
+    DirEntry 自带文件类型信息，无需对每个条目额外调用 stat。
+    
+    Args:
+        root (str): 起始目录（绝对路径）
+        
+    Yields:
+        str: ass文件路径
+    """
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            it = os.scandir(current)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                name = entry.name
+                if name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif name.endswith('.ass') and entry.is_file(follow_symlinks=False):
+                        yield entry.path
+                except OSError:
+                    pass
+
+
 def find_ass_files(directories):
     """在指定目录中查找所有ass文件
     
@@ -41,9 +81,8 @@ def find_ass_files(directories):
             log_message('warning', f'目录不存在: {abs_dir}')
             continue
 
-        # 使用glob递归搜索所有ass文件
-        pattern = os.path.join(abs_dir, '**', '*.ass')
-        found_files = glob.glob(pattern, recursive=True)
+        # 递归搜索所有ass文件
+        found_files = list(_iter_ass_files(abs_dir))
 
         ass_files.extend(found_files)
         log_message('info', f'在目录 {abs_dir} 中找到 {len(found_files)} 个ass文件')
@@ -51,6 +90,43 @@ def find_ass_files(directories):
     return ass_files
 
 
+def _remove_files_in_dir(directory, names):
+    """删除同一目录下的一组文件，日志由调用方统一输出
+    
+    支持时只打开一次父目录，再通过 dir_fd 逐个 unlink，避免每个文件重复解析完整路径。
+    
+    Args:
+        directory (str): 父目录
+        names (list): 该目录下要删除的文件名列表
+        
+    Returns:
+        list: [(文件路径, 异常或None), ...]
+    """
+    results = []
+    dir_fd = None
+    if _UNLINK_DIR_FD:
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            dir_fd = None
+
+    try:
+        for name in names:
+            file_path = os.path.join(directory, name)
+            try:
+                if dir_fd is not None:
+                    os.unlink(name, dir_fd=dir_fd)
+                else:
+                    os.remove(file_path)
+                results.append((file_path, None))
+            except Exception as e:
+                results.append((file_path, e))
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    return results
+
+
 def delete_ass_files():
     """删除监听目录下的所有ass文件
     
@@ -80,16 +156,24 @@ def delete_ass_files():
         failed_count = 0
         failed_files = []
 
-        # 逐个删除文件
+        # 按父目录分组，每个目录一个删除任务
+        groups = defaultdict(list)
         for file_path in ass_files:
-            try:
-                os.remove(file_path)
-                deleted_count += 1
-                log_message('info', f'已删除: {file_path}')
-            except Exception as e:
-                failed_count += 1
-                failed_files.append(file_path)
-                log_message('error', f'删除失败 {file_path}: {e}')
+            directory, name = os.path.split(file_path)
+            groups[directory].append(name)
+
+        # 并发删除各目录下的文件，结果在当前线程中汇总并记录日志
+        max_workers = min(MAX_DELETE_WORKERS, len(groups))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for results in executor.map(_remove_files_in_dir, groups.keys(), groups.values()):
+                for file_path, error in results:
+                    if error is None:
+                        deleted_count += 1
+                        log_message('info', f'已删除: {file_path}')
+                    else:
+                        failed_count += 1
+                        failed_files.append(file_path)
+                        log_message('error', f'删除失败 {file_path}: {error}')
 
         # 返回结果统计
         result = {
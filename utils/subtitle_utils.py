@@ -1,11 +1,65 @@
+import io
 import os
 import logging
-from lxml import etree
+import threading
 from config import DANMU_SOURCES, DEFAULT_SOURCE
 
 # 获取日志记录器
 logger = logging.getLogger('subtitle_watcher')
 
+# lxml 延迟到首次处理XML时导入，只导入 utils 包的代码路径无需加载 lxml 的C扩展
+_etree_module = None
+
+# 预编译的XPath表达式（随 lxml 一起在首次使用时创建），避免每次调用重新解析
+# 只选出需要修改的body元素（type不为subtitle），已符合要求的body无需遍历
+_BODY_BAD_XPATH = None
+_SOURCEPROVIDER_EXISTS_XPATH = None
+
+# 每个线程复用一个XML解析器（解析器实例不能跨线程并发使用）
+_parser_local = threading.local()
+
+
+def _etree():
+    """获取lxml.etree模块，首次调用时导入并编译XPath表达式"""
+    global _etree_module, _BODY_BAD_XPATH, _SOURCEPROVIDER_EXISTS_XPATH
+    if _etree_module is None:
+        from lxml import etree
+        _BODY_BAD_XPATH = etree.XPath("//body[not(@type='subtitle')]")
+        _SOURCEPROVIDER_EXISTS_XPATH = etree.XPath("boolean(//sourceprovider)")
+        _etree_module = etree
+    return _etree_module
+
+
+def _get_parser():
+    """获取当前线程的XML解析器，首次调用时创建"""
+    parser = getattr(_parser_local, 'parser', None)
+    if parser is None:
+        # huge_tree: 允许超大弹幕文件（超深嵌套/超长文本节点）不被libxml2的安全限制拒绝
+        parser = _etree().XMLParser(collect_ids=False, resolve_entities=False, no_network=True,
+                                 huge_tree=True)
+        _parser_local.parser = parser
+    return parser
+
+
+def _needs_modify(data):
+    """
+    流式扫描XML内容，判断是否需要修改（存在type不为subtitle的body元素，或缺少sourceprovider标签）
+    只在需要修改时才构建完整的元素树，已符合要求的文件无需整体解析；
+    扫描完整个文档才判定为已符合要求，截断或格式错误的XML会抛出 XMLSyntaxError，
+    注释中出现的sourceprovider也不会被当作标签
+    """
+    sourceprovider_seen = False
+    for _, elem in _etree().iterparse(io.BytesIO(data), events=("end",),
+                                   tag=("body", "sourceprovider"), huge_tree=True):
+        if elem.tag == "body":
+            if elem.get("type") != "subtitle":
+                return True
+        else:
+            sourceprovider_seen = True
+        # 释放已检查过的元素内容，控制大文件的内存占用
+        elem.clear(keep_tail=True)
+    return not sourceprovider_seen
+
 
 def modify_xml(filepath, source=None):
     """
@@ -16,39 +70,40 @@ def modify_xml(filepath, source=None):
     - 'empty': 空白文件
     - 'error': 处理错误
     """
+    etree = _etree()
     try:
         # 检查文件是否为空
         if os.path.getsize(filepath) == 0:
             print(f"⚠️ 空白文件: {filepath}")
             return 'empty'
 
+        # 文件内容只读取一次，流式检查和完整解析共用
+        with open(filepath, 'rb') as f:
+            data = f.read()
+
+        # 文件已符合要求时直接返回：流式解析完整个文档，不构建完整的元素树
+        if not _needs_modify(data):
+            return False
+
         # 解析XML文件
-        tree = etree.parse(filepath)
-        root = tree.getroot()
+        root = etree.fromstring(data, _get_parser())
+        tree = root.getroottree()
 
         modified = False
 
-        # 查找所有body元素
-        for elem in root.iter("body"):
-            current_type = elem.get("type")
-            if current_type != "subtitle":
-                elem.set("type", "subtitle")
-                modified = True
-                # logger.info(f"✅ 修改body type: {current_type} -> subtitle in {filepath}")
+        # 确定使用的弹幕源（未知或空的弹幕源统一回退到默认源），文件名后缀同时确定
+        provider_id = DANMU_SOURCES.get(source or DEFAULT_SOURCE) or DANMU_SOURCES[DEFAULT_SOURCE]
+        suffix = f"_{provider_id}"
 
-        # 检查是否已存在sourceprovider标签
-        sourceprovider_exists = False
-        for elem in root.iter("sourceprovider"):
-            sourceprovider_exists = True
-            break
+        # 查找type不为subtitle的body元素
+        for elem in _BODY_BAD_XPATH(root):
+            elem.set("type", "subtitle")
+            modified = True
+            # logger.info(f"✅ 修改body type -> subtitle in {filepath}")
 
+        # 检查是否已存在sourceprovider标签
         # 如果不存在sourceprovider标签，则添加
-        if not sourceprovider_exists:
-            # 确定使用的弹幕源
-            current_source = source or DEFAULT_SOURCE
-            provider_id = DANMU_SOURCES.get(
-                current_source, DANMU_SOURCES[DEFAULT_SOURCE])
-
+        if not _SOURCEPROVIDER_EXISTS_XPATH(root):
             sourceprovider = etree.Element("sourceprovider")
             sourceprovider.text = provider_id
             # 将sourceprovider标签插入到根元素的开头
@@ -58,38 +113,45 @@ def modify_xml(filepath, source=None):
 
         # 如果有修改，保存文件并重命名
         if modified:
-            # 构造新的文件名
-            dir_path = os.path.dirname(filepath)
-            filename = os.path.basename(filepath)
-            name, ext = os.path.splitext(filename)
-
-            # 确定使用的弹幕源后缀
-            current_source = source or DEFAULT_SOURCE
-            provider_id = DANMU_SOURCES.get(
-                current_source, DANMU_SOURCES[DEFAULT_SOURCE])
-            suffix = f"_{provider_id}"
-
-            # 检查文件名是否已经包含对应的后缀，避免重复拼接
-            if not name.endswith(suffix):
-                new_filename = f"{name}{suffix}{ext}"
-            else:
-                new_filename = filename  # 如果已经有后缀，保持原文件名
-
-            new_filepath = os.path.join(dir_path, new_filename)
-
-            # 检查新文件名是否已存在
-            if os.path.exists(new_filepath):
-                # 如果新文件名已存在，保存到原文件
-                tree.write(filepath, encoding="utf-8",
-                           xml_declaration=True, pretty_print=True)
-                # logger.info(f"💾 文件已保存(未重命名，目标文件已存在): {filepath}")
+            # 构造新的文件路径（直接在完整路径上拆分扩展名，常见的 .xml 文件无需调用 splitext）
+            if filepath.endswith(".xml"):
+                name, ext = filepath[:-4], ".xml"
             else:
-                # 保存到新文件名
-                tree.write(new_filepath, encoding="utf-8",
-                           xml_declaration=True, pretty_print=True)
+                name, ext = os.path.splitext(filepath)
+
+            # 检查文件名是否已经包含对应的后缀，避免重复拼接；如果已经有后缀，保持原文件名
+            new_filepath = filepath if name.endswith(suffix) else f"{name}{suffix}{ext}"
+
+            # 如果新文件名已存在，保存到原文件；否则保存到新文件名并删除原文件
+            target_filepath = filepath if os.path.exists(new_filepath) else new_filepath
+
+            # 先写入临时文件再原子替换，写入中途失败不会留下不完整的XML；
+            # 不重新格式化输出（pretty_print=False），保留原文件的排版
+            tmp_filepath = target_filepath + ".tmp"
+            # 先在内存中序列化为字节，再直接写入文件描述符，避免libxml2输出层的大量小块写入
+            data = etree.tostring(tree, encoding="utf-8",
+                                  xml_declaration=True, pretty_print=False)
+            fd = os.open(tmp_filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                try:
+                    view = memoryview(data)
+                    while view:
+                        view = view[os.write(fd, view):]
+                finally:
+                    os.close(fd)
+                os.replace(tmp_filepath, target_filepath)
+            except BaseException:
+                # 写入或替换失败时删除临时文件，不在视频目录中残留 .tmp 文件
+                try:
+                    os.remove(tmp_filepath)
+                except OSError:
+                    pass
+                raise
+            if target_filepath != filepath:
                 # 删除原文件
                 os.remove(filepath)
                 # logger.info(f"💾 文件已保存并重命名: {filepath} -> {new_filepath}")
+            # else: logger.info(f"💾 文件已保存(未重命名，目标文件已存在): {filepath}")
             return True
         else:
             # logger.info(f"⏩ 文件已符合要求: {filepath}")
@@ -103,22 +165,25 @@ def modify_xml(filepath, source=None):
 # 已移除未使用的 process_directory 函数，改用 app.py 中的 process_directory_with_logging
 
 
-def create_test_xml(filepath, body_type="text"):
-    """
-    创建测试用的XML文件
-    """
-    xml_content = f'''<?xml version="1.0" encoding="utf-8"?>
+# 测试XML文件模板（预先编码为字节，只需替换body type）
+_TEST_XML_TEMPLATE = '''<?xml version="1.0" encoding="utf-8"?>
 <root>
-    <body type="{body_type}">
+    <body type="%(body_type)s">
         <p>这是一个测试字幕文件</p>
         <p>用于测试XML属性修改功能</p>
-        <p>当前body type="{body_type}"</p>
+        <p>当前body type="%(body_type)s"</p>
     </body>
-</root>'''
+</root>'''.encode('utf-8')
 
+
+def create_test_xml(filepath, body_type="text"):
+    """
+    创建测试用的XML文件
+    """
+    body_type_bytes = body_type.encode('utf-8')
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(xml_content)
+    with open(filepath, 'wb') as f:
+        f.write(_TEST_XML_TEMPLATE % {b'body_type': body_type_bytes})
 
     print(f"📝 创建测试文件: {filepath}")
 
@@ -133,9 +198,11 @@ def create_test_video(filepath, size_kb=1024):
     """
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
 
-    # 创建指定大小的空文件
-    with open(filepath, 'wb') as f:
-        f.seek(size_kb * 1024 - 1)
-        f.write(b'\0')
+    # 创建指定大小的空文件：一次 ftruncate 设定长度（稀疏文件，不写入数据）
+    fd = os.open(filepath, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size_kb * 1024)
+    finally:
+        os.close(fd)
 
     print(f"📹 创建测试视频文件: {filepath} ({size_kb}KB)")
@@ -2,10 +2,82 @@ import re
 import os
 from pathlib import Path
 import logging
+import functools
 
 # 设置日志
 logger = logging.getLogger('video_parser')
 
+# 预编译的正则表达式（模块加载时编译一次，解析每个文件名时直接使用）
+# 电影特征模式（合并为一个交替模式，一次匹配完成判断）
+_MOVIE_TYPE_RE = re.compile(
+    r'.+(?:'
+    r'\s*\(\d{4}\)'                  # 包含年份的格式：电影名 (年份)
+    r'|\s+\d{4}\s*(?:[-–—]|$)'        # 电影名 年份 - 格式 / 以年份结尾：电影名 年份
+    r')', re.IGNORECASE)
+# 电视剧特征模式（仅用于调试日志，未匹配电影模式时默认即为电视剧）
+_TV_TYPE_RE = re.compile(
+    r'[Ss]\d+[Ee]\d+'                 # S01E01 格式
+    r'|第\s*\d+\s*[集话期]'              # 第X集/话/期
+    r'|[Ee][Pp]?\s*\d+'                # EP01, E01 格式
+    r'|\s\d+\s*$'                     # 以数字结尾（集数）
+    r'|[-–—]\s*\d+\s*$', re.IGNORECASE)  # 以-数字结尾
+# 电影文件名格式：电影名 (年份) - 其他信息
+_MOVIE_RE = re.compile(r'^(.+?)\s*\((\d{4})\)\s*-?\s*(.*?)$')
+# 宽松匹配：包含年份的文件名
+_MOVIE_LOOSE_RE = re.compile(r'^(.+?).*?(\d{4}).*?$')
+# 电影名中需要移除的内容：视频质量和编码信息（分辨率、编码、来源、音频）以及方括号内容
+# 质量标记不含括号字符，合并为一个交替模式一次替换，结果与先移除质量信息再移除括号相同
+_MOVIE_STRIP_RE = re.compile(
+    r'\b(?:1080p|720p|480p|4k|2160p|uhd|hd'
+    r'|x264|x265|h264|h265|hevc'
+    r'|bluray|webrip|hdtv|dvdrip|bdrip|web-dl'
+    r'|aac|ac3|dts|flac|mp3)\b'
+    r'|\[.*?\]', re.IGNORECASE)
+# 剧名中需要移除的内容：视频质量和编码信息以及方括号、圆括号内容
+_SERIES_STRIP_RE = re.compile(
+    r'\b(?:1080p|720p|480p|4k|2160p'
+    r'|x264|x265|h264|h265'
+    r'|bluray|webrip|hdtv|dvdrip|bdrip'
+    r'|aac|ac3|dts|flac|mp3)\b'
+    r'|\[.*?\]|\(.*?\)', re.IGNORECASE)
+_SEASON_EPISODE_RE = re.compile(r'[Ss]\d+[Ee]\d+', re.IGNORECASE)
+_CN_EPISODE_RE = re.compile(r'第\s*\d+\s*集')
+_EP_RE = re.compile(r'[Ee][Pp]\s*\d+', re.IGNORECASE)
+_SEPARATOR_RE = re.compile(r'[-_\s]+')
+
+# 文件名解析结果缓存条数
+PARSE_CACHE_SIZE = 8192
+
+
+@functools.lru_cache(maxsize=1024)
+def _detect_content_type(filename):
+    """
+    通过正则匹配检测内容类型（结果按文件名缓存，批量处理时同名文件无需重复匹配）
+
+    Args:
+        filename: 文件名（不含扩展名）
+
+    Returns:
+        tuple: (内容类型 'movie' 或 'tv_series', 是否为高置信度（仅 S01E01 格式的电视剧）)
+    """
+    # 电影模式优先
+    match = _MOVIE_TYPE_RE.search(filename)
+    if match:
+        logger.debug("匹配到电影模式: %s", match.group(0))
+        # 电影匹配不作为高置信度：电影解析失败的文件名（如 "[字幕组] (2021) S01E05"、
+        # "(2021) 剧名 12"）仍可能被电视剧解析识别，始终保留电视剧解析作为备选
+        return 'movie', False
+
+    # 其余情况均为电视剧（未匹配到明确模式时默认电视剧，保持向后兼容），
+    # 电视剧模式只影响调试日志，调试关闭时无需匹配
+    if logger.isEnabledFor(logging.DEBUG):
+        match = _TV_TYPE_RE.search(filename)
+        if match:
+            logger.debug("匹配到电视剧模式: %s", match.group(0))
+        else:
+            logger.debug("未匹配到明确模式，默认为电视剧")
+    return 'tv_series', bool(_SEASON_EPISODE_RE.search(filename))
+
 
 class VideoFileParser:
     """视频文件名解析器，用于提取剧名和集数信息"""
@@ -40,6 +112,28 @@ class VideoFileParser:
             'mkv', 'mp4', 'avi', 'mov'
         ]
 
+        # 预编译集数匹配模式
+        self._episode_res = [re.compile(p, re.IGNORECASE) for p in self.episode_patterns]
+        # 所有集数模式合并为一个交替模式（每个模式包一层命名组 p0、p1...），一次扫描得到全部候选；
+        # 同时记录每个模式自身捕获组在合并模式中的编号，用于取出季数和集数
+        self._episode_any_re = re.compile(
+            '|'.join('(?P<p%d>%s)' % (i, p) for i, p in enumerate(self.episode_patterns)),
+            re.IGNORECASE)
+        self._episode_group_indexes = []
+        for i, compiled in enumerate(self._episode_res):
+            outer = self._episode_any_re.groupindex['p%d' % i]
+            self._episode_group_indexes.append(range(outer + 1, outer + 1 + compiled.groups))
+        # 过滤关键词合并为一个交替模式（上下文已转为小写），一次搜索代替逐个子串检查
+        self._filter_re = re.compile('|'.join(re.escape(k) for k in self.filter_keywords))
+        # 集数指示字符（第、集、ep/e、话、-、_、空格），'ep' 已被 'e' 覆盖，合并为一个字符集
+        self._indicator_re = re.compile(r'[第集e话\-_ ]')
+
+        # 工作目录只在创建时获取一次（程序运行期间不切换工作目录），相对路径据此转为绝对路径
+        self._cwd = os.getcwd()
+
+        # 解析结果缓存：文件名解析只取决于文件名、目录和指定类型，重复扫描或重复触发的文件无需再次匹配
+        self._parse_cached = functools.lru_cache(maxsize=PARSE_CACHE_SIZE)(self._parse_filename)
+
     def parse_video_filename(self, filepath, content_type=None):
         """
         解析视频文件名，提取剧名、季数、集数等信息
@@ -56,43 +150,66 @@ class VideoFileParser:
             # 获取文件名（不包含路径）
             filename = os.path.basename(filepath)
 
-            # 获取文件目录和扩展名
-            file_dir = os.path.dirname(os.path.abspath(
-                filepath)) if os.path.dirname(filepath) else os.getcwd()
-            filename_without_ext, file_ext = os.path.splitext(filename)
+            # 获取文件目录（等价于 os.path.abspath，但相对路径复用缓存的工作目录，无需每次调用 getcwd）
+            dir_part = os.path.dirname(filepath)
+            if not dir_part:
+                file_dir = self._cwd
+            elif os.path.isabs(dir_part):
+                file_dir = os.path.normpath(dir_part)
+            else:
+                file_dir = os.path.normpath(os.path.join(self._cwd, dir_part))
 
-            logger.info(f"解析视频文件: {filename}")
-            logger.info(f"文件目录: {file_dir}")
+            logger.info("解析视频文件: %s", filename)
+            logger.debug("文件目录: %s", file_dir)
+
+            result = self._parse_cached(filename, file_dir, content_type)
+            # 返回副本，调用方修改结果不影响缓存
+            return dict(result) if result else result
 
-            # 如果指定了具体类型，直接使用对应的解析方法
-            if content_type == 'movie':
-                return self._parse_movie_filename(filename_without_ext, filename, file_dir, file_ext)
-            elif content_type == 'tv_series':
-                return self._parse_tv_series_filename(filename_without_ext, filename, file_dir, file_ext)
-            
-            # 自动检测类型：通过正则匹配优先判断
-            detected_type = self._detect_content_type(filename_without_ext)
-            logger.debug(f"检测到的内容类型: {detected_type}")
-            
-            if detected_type == 'movie':
-                movie_result = self._parse_movie_filename(filename_without_ext, filename, file_dir, file_ext)
-                if movie_result:
-                    return movie_result
-                # 电影解析失败，尝试电视剧解析作为备选
-                logger.debug("电影解析失败，尝试电视剧解析")
-                return self._parse_tv_series_filename(filename_without_ext, filename, file_dir, file_ext)
-            else:
-                # 优先尝试电视剧解析
-                tv_result = self._parse_tv_series_filename(filename_without_ext, filename, file_dir, file_ext)
-                if tv_result:
-                    return tv_result
-                # 电视剧解析失败，尝试电影解析作为备选
-                logger.debug("电视剧解析失败，尝试电影解析")
-                return self._parse_movie_filename(filename_without_ext, filename, file_dir, file_ext)
-            
         except Exception as e:
             logger.error(f"解析视频文件名时发生错误: {e}")
             return None
+
+    def _parse_filename(self, filename, file_dir, content_type):
+        """
+        按内容类型解析文件名（结果由 parse_video_filename 缓存）
+
+        Args:
+            filename: 文件名（含扩展名，不含路径）
+            file_dir: 文件目录
+            content_type: 内容类型 ('movie', 'tv_series', None)
+
+        Returns:
+            dict: 解析结果，解析失败返回None
+        """
+        filename_without_ext, file_ext = os.path.splitext(filename)
+
+        # 如果指定了具体类型，直接使用对应的解析方法
+        if content_type == 'movie':
+            return self._parse_movie_filename(filename_without_ext, filename, file_dir, file_ext)
+        elif content_type == 'tv_series':
+            return self._parse_tv_series_filename(filename_without_ext, filename, file_dir, file_ext)
+        
+        # 自动检测类型：通过正则匹配优先判断
+        detected_type, confident = self._detect_content_type(filename_without_ext)
+        logger.debug("检测到的内容类型: %s", detected_type)
+        
+        if detected_type == 'movie':
+            movie_result = self._parse_movie_filename(filename_without_ext, filename, file_dir, file_ext)
+            if movie_result:
+                return movie_result
+            # 电影解析失败，尝试电视剧解析作为备选
+            logger.debug("电影解析失败，尝试电视剧解析")
+            return self._parse_tv_series_filename(filename_without_ext, filename, file_dir, file_ext)
+        else:
+            # 优先尝试电视剧解析
+            tv_result = self._parse_tv_series_filename(filename_without_ext, filename, file_dir, file_ext)
+            # 高置信度（S01E01 格式）时不再尝试电影解析
+            if tv_result or confident:
+                return tv_result
+            # 电视剧解析失败，尝试电影解析作为备选
+            logger.debug("电视剧解析失败，尝试电影解析")
+            return self._parse_movie_filename(filename_without_ext, filename, file_dir, file_ext)
     
     def _detect_content_type(self, filename):
         """
@@ -102,39 +219,9 @@ class VideoFileParser:
             filename: 文件名（不含扩展名）
             
         Returns:
-            str: 'movie' 或 'tv_series'
+            tuple: (内容类型 'movie' 或 'tv_series', 是否为高置信度)
         """
-        # 电影特征模式（优先级从高到低）
-        movie_patterns = [
-            r'.+\s*\(\d{4}\)\s*[-–—]?\s*',  # 包含年份的格式：电影名 (年份)
-            r'.+\s+\d{4}\s*[-–—]\s*',      # 电影名 年份 - 格式（更严格）
-            r'.+\s+\d{4}\s*$',             # 以年份结尾：电影名 年份
-        ]
-        
-        # 电视剧特征模式（优先级从高到低）
-        tv_patterns = [
-            r'.*[Ss]\d+[Ee]\d+.*',          # S01E01 格式
-            r'.*第\s*\d+\s*[集话期].*',        # 第X集/话/期
-            r'.*[Ee][Pp]?\s*\d+.*',         # EP01, E01 格式
-            r'.*\s+\d+\s*$',               # 以数字结尾（集数）
-            r'.*[-–—]\s*\d+\s*$',          # 以-数字结尾
-        ]
-        
-        # 先检查电影模式
-        for pattern in movie_patterns:
-            if re.search(pattern, filename, re.IGNORECASE):
-                logger.debug(f"匹配到电影模式: {pattern}")
-                return 'movie'
-        
-        # 再检查电视剧模式
-        for pattern in tv_patterns:
-            if re.search(pattern, filename, re.IGNORECASE):
-                logger.debug(f"匹配到电视剧模式: {pattern}")
-                return 'tv_series'
-        
-        # 默认返回电视剧（保持向后兼容）
-        logger.debug("未匹配到明确模式，默认为电视剧")
-        return 'tv_series'
+        return _detect_content_type(filename)
     
     def _parse_tv_series_filename(self, filename_without_ext, full_filename, file_dir, file_ext):
         """
@@ -157,10 +244,10 @@ class VideoFileParser:
                     'file_ext': file_ext,
                     'content_type': 'tv_series'
                 }
-                logger.info(f"电视剧解析结果: {result}")
+                logger.debug("电视剧解析结果: %s", result)
                 return result
         
-        logger.debug(f"无法解析电视剧文件名: {full_filename}")
+        logger.debug("无法解析电视剧文件名: %s", full_filename)
         return None
 
     def _parse_movie_filename(self, filename_without_ext, full_filename, file_dir, file_ext):
@@ -180,13 +267,10 @@ class VideoFileParser:
             dict: 包含电影名、年份等信息的字典，解析失败返回None
         """
         try:
-            logger.debug(f"尝试解析电影文件名: {filename_without_ext}")
+            logger.debug("尝试解析电影文件名: %s", filename_without_ext)
             
-            # 电影文件名的正则表达式模式
             # 匹配格式：电影名 (年份) - 其他信息
-            movie_pattern = r'^(.+?)\s*\((\d{4})\)\s*-?\s*(.*?)$'
-            
-            match = re.match(movie_pattern, filename_without_ext)
+            match = _MOVIE_RE.match(filename_without_ext)
             if match:
                 movie_name = match.group(1).strip()
                 year = int(match.group(2))
@@ -194,13 +278,13 @@ class VideoFileParser:
                 
                 # 验证年份是否合理（1900-2030）
                 if not (1900 <= year <= 2030):
-                    logger.debug(f"年份不合理，跳过电影解析: {year}")
+                    logger.debug("年份不合理，跳过电影解析: %s", year)
                     return None
                 
                 # 清理电影名中的多余信息
                 clean_movie_name = self._clean_movie_name(movie_name)
                 if not clean_movie_name or len(clean_movie_name) < 2:
-                    logger.debug(f"电影名太短或为空，跳过: {clean_movie_name}")
+                    logger.debug("电影名太短或为空，跳过: %s", clean_movie_name)
                     return None
                 
                 result = {
@@ -217,13 +301,12 @@ class VideoFileParser:
                     'extra_info': extra_info  # 分辨率等额外信息
                 }
                 
-                logger.info(f"电影解析结果: {result}")
+                logger.debug("电影解析结果: %s", result)
                 return result
             
             # 如果不匹配标准格式，尝试更宽松的匹配
             # 匹配包含年份的文件名
-            loose_pattern = r'^(.+?).*?(\d{4}).*?$'
-            loose_match = re.search(loose_pattern, filename_without_ext)
+            loose_match = _MOVIE_LOOSE_RE.search(filename_without_ext)
             
             if loose_match:
                 movie_name = loose_match.group(1).strip()
@@ -248,10 +331,10 @@ class VideoFileParser:
                             'extra_info': ''
                         }
                         
-                        logger.info(f"电影解析结果（宽松匹配）: {result}")
+                        logger.debug("电影解析结果（宽松匹配）: %s", result)
                         return result
             
-            logger.debug(f"无法解析为电影文件名: {filename_without_ext}")
+            logger.debug("无法解析为电影文件名: %s", filename_without_ext)
             return None
             
         except Exception as e:
@@ -272,19 +355,10 @@ class VideoFileParser:
             clean_name = movie_name
             
             # 移除常见的视频质量和编码信息
-            quality_patterns = [
-                r'\b(1080p|720p|480p|4k|2160p|uhd|hd)\b',
-                r'\b(x264|x265|h264|h265|hevc)\b',
-                r'\b(bluray|webrip|hdtv|dvdrip|bdrip|web-dl)\b',
-                r'\b(aac|ac3|dts|flac|mp3)\b',
-                r'\[(.*?)\]',  # 移除方括号内容
-            ]
-            
-            for pattern in quality_patterns:
-                clean_name = re.sub(pattern, '', clean_name, flags=re.IGNORECASE)
+            clean_name = _MOVIE_STRIP_RE.sub('', clean_name)
             
             # 清理分隔符和多余空格
-            clean_name = re.sub(r'[-_\s]+', ' ', clean_name)
+            clean_name = _SEPARATOR_RE.sub(' ', clean_name)
             clean_name = clean_name.strip(' -_')
             
             return clean_name
@@ -300,31 +374,35 @@ class VideoFileParser:
         Returns:
             dict: {'season': 季数, 'episode': 集数} 或 None
         """
-        # 尝试各种集数匹配模式
-        for i, pattern in enumerate(self.episode_patterns):
-            matches = re.finditer(pattern, filename, re.IGNORECASE)
-
-            for match in matches:
-                groups = match.groups()
-
-                # S01E14 格式 (有季数和集数)
-                if i == 0 and len(groups) == 2:
-                    season = int(groups[0])
-                    episode = int(groups[1])
-                    return {'season': season, 'episode': episode}
-
-                # 其他格式 (只有集数)
-                elif len(groups) == 1:
-                    episode_num = int(groups[0])
-
-                    # 对于纯数字格式，需要额外验证
-                    if i == len(self.episode_patterns) - 1:  # 最后一个模式（纯数字）
-                        if self._is_valid_episode_number(episode_num, match, filename):
-                            return {'season': None, 'episode': episode_num}
-                    else:
-                        return {'season': None, 'episode': episode_num}
+        # 一次扫描所有集数模式，按模式优先级（列表顺序）选出结果：
+        # 优先级最高的模式中最靠前的匹配生效
+        last_index = len(self._episode_res) - 1
+        best_index = None
+        best_info = None
 
-        return None
+        for match in self._episode_any_re.finditer(filename):
+            i = int(match.lastgroup[1:])
+            if best_index is not None and i >= best_index:
+                continue
+
+            groups = tuple(match.group(g) for g in self._episode_group_indexes[i])
+
+            # S01E14 格式 (有季数和集数)，优先级最高，直接返回
+            if i == 0 and len(groups) == 2:
+                return {'season': int(groups[0]), 'episode': int(groups[1])}
+
+            # 其他格式 (只有集数)
+            if len(groups) == 1:
+                episode_num = int(groups[0])
+
+                # 对于纯数字格式，需要额外验证
+                if i == last_index:  # 最后一个模式（纯数字）
+                    if not self._is_valid_episode_number(episode_num, match, filename):
+                        continue
+                best_index = i
+                best_info = {'season': None, 'episode': episode_num}
+
+        return best_info
 
     def _is_valid_episode_number(self, episode_num, match, filename):
         """
@@ -345,16 +423,12 @@ class VideoFileParser:
         context = before_text + match_text + after_text
 
         # 检查是否包含过滤关键词
-        for keyword in self.filter_keywords:
-            if keyword in context:
-                return False
+        if self._filter_re.search(context):
+            return False
 
         # 如果数字前后有特定字符，更可能是集数
-        episode_indicators = ['第', '集', 'ep', 'e', '话', '-', '_', ' ']
-
-        for indicator in episode_indicators:
-            if indicator in before_text or indicator in after_text:
-                return True
+        if self._indicator_re.search(before_text) or self._indicator_re.search(after_text):
+            return True
 
         # 如果是两位数且在合理范围内，也认为是集数
         if 10 <= episode_num <= 99:
@@ -372,40 +446,27 @@ class VideoFileParser:
         # 移除季集信息
         if episode_info.get('season'):
             # 移除 S01E14 格式
-            clean_name = re.sub(r'[Ss]\d+[Ee]\d+', '',
-                                clean_name, flags=re.IGNORECASE)
+            clean_name = _SEASON_EPISODE_RE.sub('', clean_name)
 
         # 移除各种集数格式
-        for pattern in self.episode_patterns:
-            clean_name = re.sub(pattern, '', clean_name, flags=re.IGNORECASE)
+        for pattern in self._episode_res:
+            clean_name = pattern.sub('', clean_name)
 
         # 移除常见的视频质量和编码信息
-        quality_patterns = [
-            r'\b(1080p|720p|480p|4k|2160p)\b',
-            r'\b(x264|x265|h264|h265)\b',
-            r'\b(bluray|webrip|hdtv|dvdrip|bdrip)\b',
-            r'\b(aac|ac3|dts|flac|mp3)\b',
-            r'\[(.*?)\]',  # 移除方括号内容
-            r'\((.*?)\)',  # 移除圆括号内容
-        ]
-
-        for pattern in quality_patterns:
-            clean_name = re.sub(pattern, '', clean_name, flags=re.IGNORECASE)
+        clean_name = _SERIES_STRIP_RE.sub('', clean_name)
 
         # 清理分隔符和多余空格
-        clean_name = re.sub(r'[-_\s]+', ' ', clean_name)
+        clean_name = _SEPARATOR_RE.sub(' ', clean_name)
         clean_name = clean_name.strip(' -_')
 
         # 如果剧名为空或太短，尝试更保守的清理
         if not clean_name or len(clean_name) < 2:
             # 重新开始，只移除明确的集数标识
             clean_name = filename
-            clean_name = re.sub(r'第\s*\d+\s*集', '', clean_name)
-            clean_name = re.sub(r'[Ss]\d+[Ee]\d+', '',
-                                clean_name, flags=re.IGNORECASE)
-            clean_name = re.sub(r'[Ee][Pp]\s*\d+', '',
-                                clean_name, flags=re.IGNORECASE)
-            clean_name = re.sub(r'[-_\s]+', ' ', clean_name)
+            clean_name = _CN_EPISODE_RE.sub('', clean_name)
+            clean_name = _SEASON_EPISODE_RE.sub('', clean_name)
+            clean_name = _EP_RE.sub('', clean_name)
+            clean_name = _SEPARATOR_RE.sub(' ', clean_name)
             clean_name = clean_name.strip(' -_')
 
         return clean_name if clean_name else None
@@ -431,7 +492,7 @@ class VideoFileParser:
             else:
                 danmu_filename = f"{original_name}_{danmu_source}.xml"
 
-            logger.info(f"生成弹幕文件名: {danmu_filename}")
+            logger.info("生成弹幕文件名: %s", danmu_filename)
             return danmu_filename
 
         except Exception as e:
@@ -458,7 +519,7 @@ class VideoFileParser:
             danmu_filepath = os.path.join(
                 video_info['file_dir'], danmu_filename)
 
-            logger.info(f"弹幕文件路径: {danmu_filepath}")
+            logger.info("弹幕文件路径: %s", danmu_filepath)
             return danmu_filepath
 
         except Exception as e:
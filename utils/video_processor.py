@@ -1,5 +1,7 @@
 import os
-import asyncio
+import time
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
 import pytz
@@ -8,32 +10,114 @@ from utils.watcher import log_message, add_processed_file, get_config
 from utils.concurrent_processor import get_concurrent_processor
 
 
-def process_directory_with_logging(directory):
+# 目录扫描缓存: 目录路径 -> (st_mtime_ns, 扩展名元组, 子目录列表, 匹配的文件列表)
+# 目录的 mtime 只在其直接子项增删/重命名时变化，未变化的目录可直接复用上次的扫描结果；
+# 按LRU顺序保存，超过最大条目数时淘汰最久未使用的目录（如已删除或不再监控的目录）
+_dir_scan_cache = OrderedDict()
+_dir_scan_cache_lock = threading.Lock()
+_DIR_CACHE_MAX_ENTRIES = 4096
+
+# 最近修改过的目录不写入缓存，避免文件系统 mtime 精度不足导致漏掉同一时间窗口内的变化
+_DIR_CACHE_MIN_AGE_NS = 2_000_000_000
+
+
+def _scan_dir(root, exts_tuple):
+    """扫描单个目录，返回 (子目录列表, 扩展名匹配的文件列表)"""
+    subdirs = []
+    files = []
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.name.lower().endswith(exts_tuple) and entry.is_file():
+                files.append(entry.path)
+    return subdirs, files
+
+
+def _scan_dir_cached(root, exts_tuple):
     """
-    处理指定目录下的所有视频文件，使用并发处理器下载对应弹幕
-    返回处理的文件数量
+    带缓存的单目录扫描：mtime 未变化的目录直接复用上次的扫描结果，只需一次 stat
     """
-    if not os.path.exists(directory):
-        raise Exception(f"目录不存在: {directory}")
+    # 先取 mtime 再扫描，扫描期间发生的变化会在下次因 mtime 不一致而重新扫描
+    mtime_ns = os.stat(root).st_mtime_ns
+    with _dir_scan_cache_lock:
+        cached = _dir_scan_cache.get(root)
+        if cached and cached[0] == mtime_ns and cached[1] == exts_tuple:
+            _dir_scan_cache.move_to_end(root)
+            return cached[2], cached[3]
+    subdirs, files = _scan_dir(root, exts_tuple)
+    with _dir_scan_cache_lock:
+        if time.time_ns() - mtime_ns > _DIR_CACHE_MIN_AGE_NS:
+            _dir_scan_cache[root] = (mtime_ns, exts_tuple, subdirs, files)
+            _dir_scan_cache.move_to_end(root)
+            while len(_dir_scan_cache) > _DIR_CACHE_MAX_ENTRIES:
+                _dir_scan_cache.popitem(last=False)
+        else:
+            _dir_scan_cache.pop(root, None)
+    return subdirs, files
+
+
+def _iter_files(root, exts_tuple, use_cache=False):
+    """
+    基于 os.scandir 遍历目录树，返回扩展名匹配的文件路径
+    使用显式栈代替递归生成器，目录层级较深时每个文件无需逐层经过 yield from 传递；
+    输出顺序与递归遍历一致（先当前目录的文件，再按顺序深入子目录）
+    目录不跟随符号链接（与 os.walk 默认行为一致）
+    use_cache: 启用后 mtime 未变化的目录直接复用上次的扫描结果，只需一次 stat
+    """
+    scan = _scan_dir_cached if use_cache else _scan_dir
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            subdirs, files = scan(current, exts_tuple)
+        except OSError as e:
+            # 顶层目录不存在或不是目录时抛出，由调用方给出明确的错误信息
+            if current == root:
+                raise
+            # 子目录在遍历过程中被删除、无权限读取等，跳过该子目录继续遍历
+            log_message('warning', f"⚠️ 无法读取子目录，跳过: {current}, 错误: {e}")
+            continue
+        yield from files
+        stack.extend(reversed(subdirs))
+
 
-    # 获取支持的视频文件扩展名
+def get_video_extensions():
+    """获取支持的视频文件扩展名，统一预处理为小写元组供 str.endswith 直接匹配"""
     config = get_config()
     file_extensions = config.get(
         'file_extensions', ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm'])
+    # 兼容未带点号的扩展名配置（如 "mp4"）
+    return tuple(ext.lower() if ext.startswith('.') else '.' + ext.lower()
+                 for ext in file_extensions)
+
+
+def process_directory_with_logging(directory, exts_tuple=None, progress_cb=None):
+    """
+    处理指定目录下的所有视频文件，使用并发处理器下载对应弹幕
+    exts_tuple: 预处理好的扩展名元组，批量处理多个目录时由调用方计算一次传入
+    progress_cb: 可选的进度回调 progress_cb(已完成数, 总数)
+    返回处理的文件数量
+    """
+    if exts_tuple is None:
+        exts_tuple = get_video_extensions()
 
-    # 收集所有视频文件
-    video_files = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if any(file.lower().endswith(ext.lower()) for ext in file_extensions):
-                video_files.append(os.path.join(root, file))
+    # 单次遍历收集所有视频文件（目录不存在时由 scandir 直接抛出，省去额外的 stat）
+    use_cache = get_config().get('dir_scan_cache', True)
+    try:
+        video_files = list(_iter_files(directory, exts_tuple, use_cache))
+    except FileNotFoundError:
+        raise Exception(f"目录不存在: {directory}")
+    except NotADirectoryError:
+        raise Exception(f"路径不是目录: {directory}")
 
     log_message('info', f"📊 发现 {len(video_files)} 个视频文件待处理")
 
     if video_files:
         # 使用并发处理器批量处理所有文件
         concurrent_processor = get_concurrent_processor()
-        success_count = concurrent_processor.process_files_batch(video_files)
+        success_count = concurrent_processor.process_files_batch(
+            video_files, progress_cb=progress_cb)
         return success_count
     else:
         log_message('info', "📁 没有找到需要处理的视频文件")
@@ -1,13 +1,21 @@
+import stat
 import time
 import threading
 import os
+import re
 import json
+import tempfile
+import atexit
+import queue
 import logging
-import asyncio
+import logging.handlers
+from collections import deque, OrderedDict
 from pathlib import Path
 from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
 from watchdog.events import FileSystemEventHandler
 from datetime import datetime
+import orjson
 import pytz
 # 延迟导入避免循环导入
 # from danmu.danmu_downloader import DanmuDownloader
@@ -24,6 +32,10 @@ DEFAULT_CONFIG = {
     "max_retries": 3,
     "retry_delay": 1.0,
     "max_concurrent_workers": 4,
+    "use_polling": False,  # 网络文件系统(NFS/SMB)等不支持 inotify 时改用轮询
+    "poll_interval": 1.0,
+    "dir_scan_cache": True,  # 手动处理时复用 mtime 未变化目录的扫描结果
+    "danmu_freshness_sec": 0,  # 弹幕文件修改时间在该秒数内时跳过重新下载，0 表示总是覆盖
     "enable_logging": True,
     "log_level": "INFO",
     "max_log_lines": 5000,
@@ -39,12 +51,45 @@ DEFAULT_CONFIG = {
 # 全局变量
 _running = False
 _observer = None
-_processed_files = set()  # 只记录真正处理过的文件
+# 已处理文件记录（仅用于状态展示）：计数器 + 最近处理的文件，内存占用有上限
+_PROCESSED_RECENT_MAX = 1000
+_processed_count = 0  # 已处理文件数
+_processed_lock = threading.Lock()  # 保护计数的递增和清零，多个处理线程同时记录时计数不会回退
+_processed_recent = deque(maxlen=_PROCESSED_RECENT_MAX)  # 最近处理的文件
 _config = None
 _logger = None
-_log_check_counter = 0  # 日志检查计数器
+_last_log_check = 0.0  # 上次检查日志文件大小的时间（monotonic）
 _handler = None  # 全局处理器实例
 _danmu_downloader = None  # 弹幕下载器实例
+_danmu_downloader_lock = threading.Lock()
+_log_queue_handler = None  # 日志队列处理器，调用线程只负责入队
+_log_listener = None  # 日志队列监听线程，负责实际写入日志文件
+_log_ring_handler = None  # 最近日志的内存环形缓冲处理器，供 /api/logs 读取
+
+# 日志文件写入：由后台线程写入64KB缓冲，至少每500ms写出一次，WARNING及以上立即写出
+LOG_FLUSH_INTERVAL = 0.5
+LOG_FILE_BUFFER_SIZE = 65536
+
+# 北京时区（模块加载时构造一次，各处复用）
+BEIJING_TZ = pytz.timezone('Asia/Shanghai')
+_beijing_formatter = None
+
+# log_message 使用的级别名称到日志级别的映射
+_LOG_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL,
+}
+
+# 日志文件检查间隔（秒），与日志写入频率无关
+_LOG_CHECK_INTERVAL = 60
+# 每行日志的最小字节数（时间戳、日志器名和级别前缀），文件小于 最大行数*该值 时无需计数
+_LOG_MIN_LINE_BYTES = 32
+
+# 日志文件行格式: 时间戳[,毫秒] - 记录器名 - 级别 - 消息
+_LOG_LINE_RE = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(?:,\d+)? - [^ ]+ - (\w+) - (.*)$')
 
 
 class BeijingTimeFormatter(logging.Formatter):
@@ -52,7 +97,7 @@ class BeijingTimeFormatter(logging.Formatter):
 
     def __init__(self, fmt=None, datefmt=None, tz_name: str = 'Asia/Shanghai'):
         super().__init__(fmt, datefmt)
-        self.tz = pytz.timezone(tz_name)
+        self.tz = BEIJING_TZ if tz_name == 'Asia/Shanghai' else pytz.timezone(tz_name)
 
     def formatTime(self, record, datefmt=None):
         dt = datetime.fromtimestamp(record.created, self.tz)
@@ -61,23 +106,128 @@ class BeijingTimeFormatter(logging.Formatter):
         return dt.strftime('%Y-%m-%d %H:%M:%S')
 
 
+class RingBufferHandler(logging.Handler):
+    """将最近的日志以结构化记录保存在内存环形缓冲区中，读取时无需访问日志文件"""
+
+    def __init__(self, maxlen):
+        super().__init__()
+        self.buffer = deque(maxlen=maxlen)
+
+    def set_maxlen(self, maxlen):
+        """调整缓冲区大小，保留最新的记录"""
+        with self.lock:
+            if self.buffer.maxlen != maxlen:
+                self.buffer = deque(self.buffer, maxlen=maxlen)
+
+    def emit(self, record):
+        try:
+            level = record.levelname
+            message = record.getMessage()
+            # 附带异常堆栈（与写入日志文件的内容一致），logger.exception 等记录的错误详情不会丢失
+            if record.exc_info and not record.exc_text:
+                record.exc_text = self.formatter.formatException(record.exc_info)
+            if record.exc_text:
+                message = f"{message}\n{record.exc_text}"
+            if record.stack_info:
+                message = f"{message}\n{self.formatter.formatStack(record.stack_info)}"
+            self.buffer.append({
+                'timestamp': self.formatter.formatTime(record, self.formatter.datefmt),
+                'message': f"[{level}] {message}",
+                'level': level
+            })
+        except Exception:
+            self.handleError(record)
+
+
+class FlushingQueueListener(logging.handlers.QueueListener):
+    """日志队列监听器：在后台线程中写日志，并至少每 flush_interval 秒写出一次文件缓冲"""
+
+    def __init__(self, log_queue, *handlers, flush_interval=LOG_FLUSH_INTERVAL):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+        self._next_flush = time.monotonic() + flush_interval
+
+    def dequeue(self, block):
+        # 等待新记录的同时按时刷新；父类在队列为空时会退出循环，因此这里超时后继续等待
+        while True:
+            timeout = self._next_flush - time.monotonic()
+            if timeout <= 0:
+                self.flush()
+                continue
+            try:
+                return self.queue.get(block, timeout)
+            except queue.Empty:
+                if not block:
+                    raise
+
+    def flush(self):
+        """将各处理器中缓冲的日志写入文件"""
+        self._next_flush = time.monotonic() + self.flush_interval
+        for handler in self.handlers:
+            handler.flush()
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """使用 64KB 写缓冲的日志文件处理器
+
+    普通记录只写入缓冲区，WARNING 及以上级别立即写入磁盘，其余由定时刷新写出
+    """
+
+    def __init__(self, filename, mode='a', encoding=None, buffer_size=LOG_FILE_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        super().__init__(filename, mode, encoding)
+
+    def _open(self):
+        return open(self.baseFilename, self.mode, encoding=self.encoding,
+                    buffering=self.buffer_size)
+
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.WARNING:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+
 def get_beijing_formatter():
-    """获取统一的北京时间日志格式化器"""
-    return BeijingTimeFormatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    """获取统一的北京时间日志格式化器（单例，各处理器共用）"""
+    global _beijing_formatter
+    if _beijing_formatter is None:
+        _beijing_formatter = BeijingTimeFormatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+    return _beijing_formatter
 
 
 def get_global_downloader():
     """获取全局弹幕下载器实例
 
+    首次调用时按当前配置创建，所有处理线程和缓存管理接口共用同一实例（及其缓存和连接池）
+
     Returns:
-        DanmuDownloader: 全局下载器实例，如果不存在则返回None
+        DanmuDownloader: 全局下载器实例
     """
+    global _danmu_downloader
+    if _danmu_downloader is None:
+        with _danmu_downloader_lock:
+            if _danmu_downloader is None:
+                # 延迟导入避免循环导入
+                from danmu.danmu_downloader import DanmuDownloader
+                _danmu_downloader = DanmuDownloader(get_config())
     return _danmu_downloader
 
 
+def reset_global_downloader():
+    """丢弃全局弹幕下载器实例，下次使用时按最新配置重新创建"""
+    global _danmu_downloader
+    with _danmu_downloader_lock:
+        _danmu_downloader = None
+
+
 def load_config():
     """加载配置文件"""
     global _config
@@ -97,10 +247,35 @@ def load_config():
 
 
 def save_config():
-    """保存配置文件"""
+    """保存配置文件
+
+    先完整写入同目录下的临时文件再原子替换，避免写入中断导致配置文件损坏
+    """
     try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(_config, f, indent=2, ensure_ascii=False)
+        config_dir = os.path.dirname(CONFIG_FILE)
+        os.makedirs(config_dir, exist_ok=True)
+        data = orjson.dumps(_config, option=orjson.OPT_INDENT_2)
+
+        # 保留原配置文件的权限（mkstemp 创建的文件默认为 0600）
+        try:
+            mode = os.stat(CONFIG_FILE).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+
+        fd, tmp_path = tempfile.mkstemp(dir=config_dir, prefix='.config.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, CONFIG_FILE)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
     except Exception as e:
         log_message('error', f"配置文件保存失败: {e}")
         print(f"⚠️ 配置文件保存失败: {e}")
@@ -116,31 +291,145 @@ def setup_logger():
     _logger = logging.getLogger('subtitle_watcher')
     _logger.setLevel(getattr(logging, _config.get('log_level', 'INFO')))
 
-    # 清除现有的处理器
+    # 清除现有的处理器（日志队列和内存缓冲处理器全局共用，不关闭）
+    for handler in _logger.handlers:
+        if handler not in (_log_ring_handler, _log_queue_handler):
+            handler.close()
     _logger.handlers.clear()
 
     # 控制台处理器
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
 
-    # 文件处理器
-    os.makedirs('logs', exist_ok=True)
-    file_handler = logging.FileHandler('logs/watcher.log', encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
-
     # 使用统一的北京时间格式化器
-    formatter = get_beijing_formatter()
-    console_handler.setFormatter(formatter)
-    file_handler.setFormatter(formatter)
+    console_handler.setFormatter(get_beijing_formatter())
 
     _logger.addHandler(console_handler)
     if _config.get('enable_logging', True):
-        _logger.addHandler(file_handler)
+        _logger.addHandler(get_log_queue_handler())
+        _logger.addHandler(get_log_ring_handler())
 
     # 启动时检查日志文件大小
     check_and_truncate_log()
 
 
+def get_log_queue_handler():
+    """获取写入日志文件的队列处理器（全局唯一，多个日志器共用同一个文件句柄）
+
+    调用线程只将日志记录放入队列，由 QueueListener 后台线程写入日志文件；
+    进程退出时会先停止监听线程，写完队列中剩余的记录
+    """
+    global _log_queue_handler, _log_listener
+    if _log_queue_handler is None:
+        os.makedirs('logs', exist_ok=True)
+        file_handler = BufferedFileHandler('logs/watcher.log', encoding='utf-8')
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(get_beijing_formatter())
+
+        log_queue = queue.Queue(-1)
+        _log_queue_handler = logging.handlers.QueueHandler(log_queue)
+        _log_queue_handler.setLevel(logging.DEBUG)
+        _log_listener = FlushingQueueListener(log_queue, file_handler)
+        _log_listener.start()
+        atexit.register(_stop_log_listener)
+    return _log_queue_handler
+
+
+def _stop_log_listener():
+    """停止日志监听线程，写出队列和缓冲中剩余的日志"""
+    if _log_listener is not None and _log_listener._thread is not None:
+        _log_listener.stop()
+        _log_listener.flush()
+
+
+def get_log_ring_handler():
+    """获取最近日志的内存环形缓冲处理器（全局唯一，重建日志器时保留已有记录）"""
+    global _log_ring_handler
+    max_lines = _config.get('max_log_lines', 5000) if _config else 5000
+    if _log_ring_handler is None:
+        _log_ring_handler = RingBufferHandler(max_lines)
+        _log_ring_handler.setLevel(logging.DEBUG)
+        _log_ring_handler.setFormatter(get_beijing_formatter())
+        # 首次创建时载入日志文件中已有的记录，重启后仍能看到历史日志
+        _load_log_history(_log_ring_handler.buffer)
+    else:
+        _log_ring_handler.set_maxlen(max_lines)
+    return _log_ring_handler
+
+
+def _parse_log_line(line):
+    """解析日志文件中的一行，格式: 2025-06-24 23:13:57 - subtitle_watcher - INFO - 消息"""
+    match = _LOG_LINE_RE.match(line)
+    if match:
+        # 时间戳分组不含毫秒部分
+        timestamp, level, message = match.groups()
+        return {
+            'timestamp': timestamp,
+            'message': f"[{level}] {message}",
+            'level': level
+        }
+    # 如果格式不匹配，直接显示原始行，使用当前北京时间
+    return {
+        'timestamp': datetime.now(BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S'),
+        'message': line,
+        'level': 'INFO'
+    }
+
+
+def tail_lines(path, n, chunk_size=65536):
+    """从文件末尾向前分块读取，返回最后 n 行（读取量只与 n 行的长度有关，与文件大小无关）"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = bytearray()
+        # 多读一个换行符，保证第一行是完整的
+        while pos > 0 and data.count(b'\n') <= n:
+            read_size = min(chunk_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            data[:0] = f.read(read_size)
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    return lines[-n:] if n > 0 else []
+
+
+def _load_log_history(buffer):
+    """从日志文件末尾载入最近的历史记录到缓冲区"""
+    try:
+        for line in tail_lines('logs/watcher.log', buffer.maxlen):
+            line = line.strip()
+            if line:
+                buffer.append(_parse_log_line(line))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"📝 读取历史日志失败: {e}")
+
+
+def get_recent_logs():
+    """获取内存中的最近日志记录"""
+    if _log_ring_handler is None:
+        return []
+    # 与 emit 共用处理器锁，避免复制时缓冲区被并发修改
+    with _log_ring_handler.lock:
+        return list(_log_ring_handler.buffer)
+
+
+def clear_recent_logs():
+    """清空内存中的最近日志记录"""
+    if _log_ring_handler is not None:
+        _log_ring_handler.buffer.clear()
+
+
+def flush_logs():
+    """立即将队列和缓冲中的日志写入文件"""
+    listener = _log_listener
+    if listener is not None:
+        if listener._thread is not None:
+            # 等待监听线程处理完已入队的记录
+            listener.queue.join()
+        listener.flush()
+
+
 def check_and_truncate_log():
     """检查日志文件行数，超过配置的最大行数则自动清空"""
     if _config is None:
@@ -149,17 +438,29 @@ def check_and_truncate_log():
     log_file_path = 'logs/watcher.log'
     if os.path.exists(log_file_path):
         try:
-            with open(log_file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                line_count = len(lines)
-
             max_lines = _config.get('max_log_lines', 3000)
             keep_lines = _config.get('keep_log_lines', 1000)
 
+            # 先按文件大小快速判断：每行至少有固定长度的前缀，文件足够小时行数不可能超限
+            if os.path.getsize(log_file_path) < max_lines * _LOG_MIN_LINE_BYTES:
+                return
+
+            # 以字节方式读取并统计换行符，无需解码和拆分出每一行
+            with open(log_file_path, 'rb') as f:
+                data = f.read()
+            line_count = data.count(b'\n')
+            if data and not data.endswith(b'\n'):
+                line_count += 1
+
             if line_count > max_lines:
-                # 保留最后指定行数，删除前面的
-                with open(log_file_path, 'w', encoding='utf-8') as f:
-                    f.writelines(lines[-keep_lines:])
+                # 保留最后指定行数，删除前面的：从末尾向前定位第 keep_lines 行的起始位置
+                pos = len(data) - 1 if data.endswith(b'\n') else len(data)
+                for _ in range(keep_lines):
+                    pos = data.rfind(b'\n', 0, pos)
+                    if pos < 0:
+                        break
+                with open(log_file_path, 'wb') as f:
+                    f.write(data[pos + 1:])
                 print(f"📝 日志文件已自动清理，从 {line_count} 行减少到 {keep_lines} 行")
                 if _logger:
                     _logger.info(
@@ -170,27 +471,62 @@ def check_and_truncate_log():
                 _logger.error(f"检查日志文件时出错: {e}")
 
 
+def is_debug_enabled():
+    """当前日志级别是否输出debug日志，调用方可据此跳过debug消息的格式化"""
+    return _logger is not None and _logger.isEnabledFor(logging.DEBUG)
+
+
 def log_message(level, message):
     """统一的日志记录函数"""
-    global _log_check_counter
+    global _last_log_check
 
     if _logger:
-        getattr(_logger, level.lower())(message)
+        # 级别未启用时（如关闭调试时的debug消息）既不写日志也不打印，省去格式化和 stdout 锁竞争
+        levelno = _LOG_LEVELS.get(level.lower(), logging.INFO)
+        if not _logger.isEnabledFor(levelno):
+            return
+        _logger.log(levelno, message)
     print(f"📝 {message}")
 
-    # 每100次日志写入后检查一次文件大小，避免频繁IO操作
-    _log_check_counter += 1
-    if _log_check_counter >= 100:
+    # 按时间间隔检查日志文件大小，检查频率不随日志写入量增长
+    now = time.monotonic()
+    if now - _last_log_check >= _LOG_CHECK_INTERVAL:
+        _last_log_check = now
         check_and_truncate_log()
-        _log_check_counter = 0
+
+
+def _wait_stable(filepath, timeout=2.0, interval=0.05):
+    """等待文件大小稳定（两次探测大小一致）后返回，文件仍在写入时最多等待 timeout 秒
+
+    Returns:
+        bool: 文件大小已稳定返回True，超时或文件不可访问返回False
+    """
+    try:
+        size = os.path.getsize(filepath)
+        for _ in range(int(timeout / interval)):
+            time.sleep(interval)
+            new_size = os.path.getsize(filepath)
+            if new_size == size:
+                return True
+            size = new_size
+    except OSError:
+        pass
+    return False
 
 
 class SubtitleHandler(FileSystemEventHandler):
     def __init__(self):
         super().__init__()
         self.processing_files = set()  # 记录正在处理的文件，避免重复处理
-        self.recent_events = {}  # 记录最近的事件时间，用于去重
+        # 记录最近的事件时间，用于去重；按时间先后排列，过期记录总在头部
+        self.recent_events = OrderedDict()
         self.concurrent_processor = get_concurrent_processor()
+        self.refresh_extensions()
+
+    def refresh_extensions(self):
+        """按当前配置重建小写的视频扩展名集合，事件处理时只需一次哈希查找"""
+        self.video_extensions = frozenset(
+            ext.lower() for ext in _config.get('file_extensions', DEFAULT_CONFIG['file_extensions']))
 
     def _schedule_processing(self, filepath):
         """在独立的定时器线程中延迟调度处理，避免阻塞watchdog事件线程"""
@@ -198,6 +534,8 @@ class SubtitleHandler(FileSystemEventHandler):
 
         def run():
             try:
+                # 文件可能仍在写入，等待大小稳定后再处理（稳定时只需一次短暂探测）
+                _wait_stable(filepath)
                 self.process_file(filepath)
             finally:
                 # 在处理调度后移除，避免长时间占用去重集合
@@ -234,11 +572,10 @@ class SubtitleHandler(FileSystemEventHandler):
         current_time = time.time()
         event_key = f"{filepath}_{event_type}"
 
-        # 清理过期的事件记录（超过5秒的记录）
-        expired_keys = [key for key, timestamp in self.recent_events.items()
-                        if current_time - timestamp > 5.0]
-        for key in expired_keys:
-            del self.recent_events[key]
+        # 清理过期的事件记录（超过5秒的记录），只需从头部弹出，无需遍历全部记录
+        recent_events = self.recent_events
+        while recent_events and current_time - next(iter(recent_events.values())) > 5.0:
+            recent_events.popitem(last=False)
 
         # 精确去重：只检查完全匹配的事件键
         if event_key in self.recent_events:
@@ -252,49 +589,32 @@ class SubtitleHandler(FileSystemEventHandler):
             if current_time - last_time < dedup_time:
                 return False  # 短时间内有相同的事件，跳过处理
 
-        # 记录当前事件
+        # 记录当前事件（移到末尾，保持按时间排序）
         self.recent_events[event_key] = current_time
+        self.recent_events.move_to_end(event_key)
         return True
 
     def _is_valid_file(self, filepath):
         """检查文件是否为有效的视频文件"""
         # 检查文件扩展名
-        file_ext = os.path.splitext(filepath)[1].lower()
-        video_extensions = _config.get(
-            'file_extensions', [".mp4", ".mkv", ".avi", ".mov", ".wmv", ".flv", ".webm"])
-
-        if file_ext not in video_extensions:
+        if os.path.splitext(filepath)[1].lower() not in self.video_extensions:
             return False
 
-        # 检查文件是否存在且可读
+        # 检查文件是否存在且为普通文件（一次 stat；不可读的文件在后续打开时会报错并由下载流程处理）
+        # 文件不存在、无权限或路径非法（如包含空字符）时视为无效文件
         try:
-            if not os.path.isfile(filepath) or not os.access(filepath, os.R_OK):
-                return False
-
-            # 等待一小段时间，防止文件正在写入中
-            time.sleep(0.1)
-
-            return True
-        except Exception as e:
-            # 只有当文件不在处理列表中时才记录错误，避免重复日志
-            if filepath not in self.processing_files:
-                log_message('error', f"❌ 文件验证失败: {filepath}, 错误: {e}")
+            st = os.stat(filepath)
+        except (OSError, ValueError):
             return False
 
+        # 不在事件线程中等待文件写入完成，由调度线程在处理前检查文件大小是否稳定
+        return stat.S_ISREG(st.st_mode)
+
     def process_file(self, filepath):
         """处理视频文件，使用并发处理器"""
         # 使用并发处理器处理文件
         return self.concurrent_processor.process_file_concurrent(filepath)
 
-    async def _process_video_async(self, filepath):
-        """异步处理视频文件弹幕下载"""
-        global _danmu_downloader
-        try:
-            return await _danmu_downloader.process_video_file(filepath)
-        except Exception as e:
-            log_message('error', f"❌ 异步处理视频文件失败: {filepath}, 错误: {e}")
-            return None
-
 
 def start_watcher():
     """启动文件监听器"""
@@ -321,7 +641,12 @@ def start_watcher():
             raise ValueError("没有配置监听目录")
 
         _running = True
-        _observer = Observer()
+        # 默认使用系统原生事件通知（Linux 下为 inotify，空闲时不占用CPU）
+        use_polling = _config.get('use_polling', False)
+        if use_polling:
+            _observer = PollingObserver(timeout=_config.get('poll_interval', 1.0))
+        else:
+            _observer = Observer()
 
         # 创建或重置全局处理器实例
         if _handler is None:
@@ -330,6 +655,7 @@ def start_watcher():
             # 重置处理器状态，并刷新并发处理器实例
             _handler.processing_files.clear()
             _handler.concurrent_processor = get_concurrent_processor()
+            _handler.refresh_extensions()
 
         # 为每个目录设置监听
         valid_dirs = []
@@ -360,6 +686,11 @@ def start_watcher():
         for dir_path in valid_dirs:
             log_message('info', f"  - {dir_path}")
         log_message('info', f"🔍 监听器状态: 运行中")
+        if use_polling:
+            log_message(
+                'info', f"🔁 监听模式: 轮询 (间隔 {_config.get('poll_interval', 1.0)} 秒)")
+        else:
+            log_message('info', f"⚡ 监听模式: 系统事件通知 ({type(_observer).__name__})")
         log_message(
             'info', f"📋 支持的视频文件类型: {_config.get('file_extensions', ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm'])}")
 
@@ -393,6 +724,8 @@ def stop_watcher():
 
         # 关闭并发处理器
         shutdown_concurrent_processor()
+        # 下次启动时按最新配置重新创建弹幕下载器
+        reset_global_downloader()
 
         log_message('info', "🛑 停止监听")
         return True
@@ -413,8 +746,7 @@ def restart_watcher():
     load_config()
     
     # 重置全局弹幕下载器实例以应用新配置
-    global _danmu_downloader
-    _danmu_downloader = None
+    reset_global_downloader()
     
     return start_watcher()
 
@@ -425,23 +757,33 @@ def is_running():
 
 
 def get_processed_files():
-    """获取已处理文件列表"""
-    return list(_processed_files)
+    """获取最近处理的文件列表（最多保留 _PROCESSED_RECENT_MAX 个）"""
+    with _processed_lock:
+        return list(_processed_recent)
 
 
 def clear_processed_files():
     """清空已处理文件记录"""
-    global _processed_files
-    count = len(_processed_files)
-    _processed_files.clear()
+    global _processed_count
+    with _processed_lock:
+        count = _processed_count
+        _processed_count = 0
+        _processed_recent.clear()
     log_message('info', f"🗑️ 已清空 {count} 个文件的处理记录")
     return count
 
 
+def _record_processed(filepath):
+    """记录一个已处理的文件：递增计数并加入最近处理列表"""
+    global _processed_count
+    with _processed_lock:
+        _processed_count += 1
+        _processed_recent.append(filepath)
+
+
 def add_processed_file(filepath):
     """手动添加已处理文件到计数中"""
-    global _processed_files
-    _processed_files.add(filepath)
+    _record_processed(filepath)
     log_message('debug', f"📝 已添加到处理记录: {filepath}")
 
 
@@ -465,6 +807,10 @@ def update_config(new_config):
     if any(key in new_config for key in ['enable_logging', 'log_level']):
         setup_logger()
 
+    # 视频扩展名变化时同步到事件处理器
+    if _handler is not None and 'file_extensions' in new_config:
+        _handler.refresh_extensions()
+
     # 如果监听器正在运行，提示重启
     if _running:
         log_message('info', "💡 配置已更新，建议重启监听器以应用新配置")
@@ -474,12 +820,11 @@ def update_config(new_config):
 
 def get_status():
     """获取监听器详细状态"""
-    beijing_tz = pytz.timezone('Asia/Shanghai')
-    current_time = datetime.now(beijing_tz).strftime('%Y-%m-%d %H:%M:%S')
+    current_time = datetime.now(BEIJING_TZ).strftime('%Y-%m-%d %H:%M:%S')
     
     return {
         'running': is_running(),
-        'processed_count': len(_processed_files),
+        'processed_count': _processed_count,
         'current_time': current_time
     }
 
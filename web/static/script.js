@@ -223,10 +223,16 @@ class SubtitleWatcher {
       }, 500);
 
       // 直接调用API，不传递目录参数，后端会自动处理所有监控目录
-      const result = await this.apiCall("/process-now", {
+      const submitResult = await this.apiCall("/process-now", {
         method: "POST",
       });
 
+      // 后端在后台执行处理任务，轮询任务状态直到结束
+      let result = submitResult;
+      if (submitResult.success && submitResult.job_id) {
+        result = await this.waitForProcessJob(submitResult.job_id);
+      }
+
       // 停止频繁刷新
       if (processingInterval) {
         clearInterval(processingInterval);
@@ -253,6 +259,47 @@ class SubtitleWatcher {
     }
   }
 
+  async waitForProcessJob(jobId) {
+    // 每秒轮询一次任务状态，最多等待1小时；任务不存在（404，如服务重启或已被清理）时立即结束，
+    // 网络或服务端的偶发错误允许连续重试若干次
+    const pollInterval = 1000;
+    const maxWaitMs = 60 * 60 * 1000;
+    const maxConsecutiveErrors = 5;
+    const deadline = Date.now() + maxWaitMs;
+    let consecutiveErrors = 0;
+
+    while (Date.now() < deadline) {
+      await new Promise((resolve) => setTimeout(resolve, pollInterval));
+      let response;
+      try {
+        response = await fetch(`${this.apiBase}/process-now/${jobId}`);
+      } catch (error) {
+        response = null;
+      }
+
+      if (response && response.status === 404) {
+        return { success: false, message: "处理任务不存在或已过期" };
+      }
+      if (!response || !response.ok) {
+        consecutiveErrors += 1;
+        if (consecutiveErrors >= maxConsecutiveErrors) {
+          return { success: false, message: "获取处理任务状态失败" };
+        }
+        continue;
+      }
+      consecutiveErrors = 0;
+
+      const job = await response.json();
+      if (job.status === "completed" || job.status === "failed") {
+        return job;
+      }
+    }
+    return {
+      success: false,
+      message: "等待处理任务超时，任务可能仍在后台运行，请稍后查看日志",
+    };
+  }
+
   async refreshStatus() {
     try {
       const status = await this.apiCall("/status");